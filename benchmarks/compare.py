@@ -0,0 +1,59 @@
+"""Compare two benchmark reports result by result and flag regressions.
+
+    python benchmarks/compare.py baseline.json candidate.json [--threshold 0.1]
+
+A result regresses when its throughput drops, or its p99 latency grows, by more than threshold.  Exits with 1 if
+any result regressed.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    """The report's settings and its results keyed by name."""
+    with open(path) as report_file:
+        report = json.load(report_file)
+    return report['meta'].get('settings'), dict((result['name'], result) for result in report['results'])
+
+
+def ratio(new, old):
+    if not new or not old:
+        return None
+    return float(new) / old
+
+
+def compare(baseline, candidate, threshold):
+    """(name, throughput ratio, p99 ratio, regressed) for every result present in both reports."""
+    rows = []
+    for name in sorted(set(baseline) & set(candidate)):
+        throughput = ratio(candidate[name]['ops_per_second'], baseline[name]['ops_per_second'])
+        p99 = ratio(candidate[name]['p99'], baseline[name]['p99'])
+        regressed = (throughput is not None and throughput < 1 - threshold) or \
+                    (p99 is not None and p99 > 1 + threshold)
+        rows.append((name, throughput, p99, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.1, help="allowed relative change, 0.1 for 10%%")
+    args = parser.parse_args()
+    (baseline_settings, baseline), (candidate_settings, candidate) = load(args.baseline), load(args.candidate)
+    if baseline_settings != candidate_settings:
+        print "Warning: the reports were run with different settings: %r and %r" % (baseline_settings,
+                                                                                     candidate_settings)
+    rows = compare(baseline, candidate, args.threshold)
+    print "%-40s %12s %12s" % ("benchmark", "throughput", "p99")
+    for name, throughput, p99, regressed in rows:
+        print "%-40s %12s %12s%s" % (name, "%.2fx" % throughput if throughput else "-",
+                                     "%.2fx" % p99 if p99 else "-", "   REGRESSED" if regressed else "")
+    for name in sorted(set(baseline) ^ set(candidate)):
+        print "%-40s only in %s" % (name, args.baseline if name in baseline else args.candidate)
+    return 1 if any(row[3] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Compiled single pass HTML extraction against re-parsing the page once per field.
+
+convert() extracts text/html responses with the compiled schema.  Results go to the JSON report of report.py, so
+compare.py tracks extraction alongside the other suites.
+
+    python benchmarks/extract_benchmark.py [--products 100,1000] [--repeats N] [--output report.json]
+"""
+import argparse
+import sys
+
+from report import measure, print_result, write_report
+from simplewebscraper.extract import Schema, compile_schema, import_lxml
+
+FIELDS = {'name': 'h2.name', 'price': 'span.price', 'link': 'a@href', 'sku': '@id', 'rating': 'div.rating span',
+          'stock': 'p.stock', 'image': 'img@src', 'brand': 'ul.specs li.brand'}
+RECORD = 'div.product'
+
+
+def make_page(products):
+    product = ('<div class="product" id="p%d"><img src="/img/%d.png"><h2 class="name">Item %d</h2>'
+               '<span class="price">%d.99</span><div class="rating"><span>4.%d</span></div>'
+               '<p class="stock">In stock</p><ul class="specs"><li class="brand">Brand %d<li>Other</ul>'
+               '<a href="/p/%d">details</a></div>')
+    return ('<html><head><title>Shop</title></head><body>%s</body></html>'
+            % ''.join(product % ((i,) * 7) for i in xrange(products)))
+
+
+def compiled(page, backend):
+    return compile_schema(FIELDS, RECORD, backend).extract(page)
+
+
+def naive(page, backend):
+    columns = [(name, Schema({name: selector}, RECORD, backend).extract(page)) for name, selector in FIELDS.items()]
+    return [dict((name, records[index][name]) for name, records in columns) for index in xrange(len(columns[0][1]))]
+
+
+def run(product_counts=(100, 1000), repeats=5):
+    backends = ['html.parser'] + (['lxml'] if import_lxml(required=False) else [])
+    results = []
+    for products in product_counts:
+        page = make_page(products)
+        for backend in backends:
+            if compiled(page, backend) != naive(page, backend):
+                raise AssertionError("Compiled and naive extraction disagree for %s." % backend)
+            for name, extract in (('compiled', compiled), ('naive', naive)):
+                result = measure("extract.%s.%s.%d" % (name, backend, products), 'extract',
+                                 lambda: extract(page, backend), repeats, warmup=1, backend=backend,
+                                 products=products, page_bytes=len(page), fields=len(FIELDS))
+                print_result(result)
+                results.append(result)
+    return results
+
+
+def integers(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=integers, default=[100, 1000], help="comma separated products per page")
+    parser.add_argument('--repeats', type=int, default=5, help="timed extractions per page and backend")
+    parser.add_argument('--output', default='-', help="JSON report file, - for stdout")
+    args = parser.parse_args()
+    results = run(args.products, args.repeats)
+    write_report(results, args.output, products=args.products, repeats=args.repeats)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
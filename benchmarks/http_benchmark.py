@@ -0,0 +1,86 @@
+"""Requests/s and p50/p99 latency of Connect.send against the local stand-in server, directly and through the local
+forwarding proxy.
+
+    python benchmarks/http_benchmark.py [--requests N] [--download-size BYTES] [--output report.json]
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+import local_server
+from report import measure, print_result, write_report
+from simplewebscraper import HTTPMethod, Request
+from simplewebscraper.connection import Connect
+
+POST_PARAMETERS = dict(("field%d" % i, "value %d" % i) for i in xrange(20))
+
+logger = logging.getLogger("benchmark")
+logger.addHandler(logging.NullHandler())
+
+
+def scenarios(origin, download_size, download_path):
+    """(name, Request, expected content check) for every scenario.  Downloads are saved rather than returned."""
+    downloaded = os.path.join(download_path, origin.split('://')[1], "%d.png" % download_size)
+    return [
+        ('get', Request(origin + '/text'), lambda content: content.startswith("line 0")),
+        ('post', Request(origin + '/post', HTTPMethod.POST, POST_PARAMETERS), lambda content: "field0" in content),
+        ('gzip', Request(origin + '/gzip'), lambda content: content.startswith("line 0")),
+        ('json', Request(origin + '/json'), lambda content: len(content['results']) == 1000),
+        ('xml', Request(origin + '/xml'), lambda content: len(content.find('channel')) == 1000),
+        ('download', Request(origin + '/download/%d' % download_size),
+         lambda content: os.path.getsize(downloaded) == download_size),
+    ]
+
+
+def make_scraper(download_path, proxy=None):
+    scraper = Connect(logger)
+    scraper.download_path = download_path
+    if proxy:
+        scraper.use_per_proxy_count = 10 ** 9
+        scraper.proxy_pool = {'http': [proxy]}
+    return scraper
+
+
+def run(requests_per_scenario=200, download_size=16 * 1024 * 1024, download_requests=10):
+    workdir = tempfile.mkdtemp(prefix="sws-benchmark-")
+    cwd = os.getcwd()
+    os.chdir(workdir)  # The proxy quarantine database is created in the working directory.
+    try:
+        origin = local_server.start_origin()
+        proxy = local_server.start_proxy()
+        results = []
+        for route, proxy_url in (('direct', None), ('proxy', proxy)):
+            scraper = make_scraper(workdir, proxy_url)
+            for name, request, check in scenarios(origin, download_size, workdir):
+                if not check(scraper.send(request)):
+                    raise AssertionError("Unexpected response for %s %s." % (name, route))
+                operations = download_requests if name == 'download' else requests_per_scenario
+                result = measure("http.%s.%s" % (name, route), 'http', lambda: scraper.send(request), operations,
+                                 warmup=min(10, operations), route=route)
+                if name == 'download':
+                    result['bytes_per_second'] = download_size * result['ops_per_second']
+                print_result(result)
+                results.append(result)
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help="timed requests per scenario")
+    parser.add_argument('--download-size', type=int, default=16 * 1024 * 1024, help="bytes per download")
+    parser.add_argument('--download-requests', type=int, default=10, help="timed downloads per route")
+    parser.add_argument('--output', default='-', help="JSON report file, - for stdout")
+    args = parser.parse_args()
+    results = run(args.requests, args.download_size, args.download_requests)
+    write_report(results, args.output, requests=args.requests, download_size=args.download_size,
+                 download_requests=args.download_requests)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Stand-in origin server and forwarding proxy for the benchmarks, both on 127.0.0.1 in background threads.
+
+Response bodies are built once at import so the server costs as little as possible per request.
+"""
+import BaseHTTPServer
+import SocketServer
+import StringIO
+import gzip
+import httplib
+import json
+import threading
+import urlparse
+
+TEXT_BODY = "".join("line %d of a plain text page\n" % i for i in xrange(200))
+JSON_BODY = json.dumps({'results': [{'id': i, 'name': "item %d" % i, 'price': i * 1.5, 'tags': ["a", "b"]}
+                                    for i in xrange(1000)]})
+XML_BODY = ("<rss><channel>%s</channel></rss>"
+            % "".join("<item><id>%d</id><title>item %d</title><price>%d.5</price></item>" % (i, i, i)
+                      for i in xrange(1000)))
+
+
+def gzipped(data):
+    buffer_object = StringIO.StringIO()
+    compressor = gzip.GzipFile(fileobj=buffer_object, mode='wb')
+    compressor.write(data)
+    compressor.close()
+    return buffer_object.getvalue()
+
+
+GZIP_BODY = gzipped(TEXT_BODY * 50)
+DOWNLOAD_CHUNK = "\x89PNG" * (64 * 1024 // 4)
+
+
+class OriginHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """GET /text, /json, /xml, /gzip and /download/<bytes>; POST /post echoes the request body."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1
+    routes = {
+        '/text': (TEXT_BODY, 'text/plain', None),
+        '/json': (JSON_BODY, 'application/json', None),
+        '/xml': (XML_BODY, 'text/xml', None),
+        '/gzip': (GZIP_BODY, 'text/plain', 'gzip'),
+    }
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type, encoding=None, code=200):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse.urlsplit(self.path).path
+        if path in self.routes:
+            self.send_body(*self.routes[path])
+        elif path.startswith('/download/'):
+            self.send_download(int(path.rsplit('/', 1)[1]))
+        else:
+            self.send_body("not found", 'text/plain', code=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.send_body(self.rfile.read(length), 'text/plain')
+
+    def send_download(self, size):
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        while size > 0:
+            self.wfile.write(DOWNLOAD_CHUNK[:size])
+            size -= len(DOWNLOAD_CHUNK)
+
+
+class ProxyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Plain HTTP forwarding proxy.  Each client connection keeps its own keep-alive connection to every origin."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1
+    hop_by_hop = frozenset(['connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te',
+                            'trailers', 'transfer-encoding', 'upgrade', 'proxy-connection'])
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.origins = {}
+
+    def finish(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+        for origin in self.origins.itervalues():
+            origin.close()
+
+    def log_message(self, format, *args):
+        pass
+
+    def forward(self):
+        url = urlparse.urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+        headers = dict((name, value) for name, value in self.headers.items() if name.lower() not in self.hop_by_hop)
+        origin = self.origins.get(url.netloc)
+        if origin is None:
+            origin = self.origins[url.netloc] = httplib.HTTPConnection(url.netloc)
+        origin.request(self.command, url.path + ('?' + url.query if url.query else ''), body, headers)
+        response = origin.getresponse()
+        content = response.read()
+
+        self.send_response(response.status, response.reason)
+        for name, value in response.getheaders():
+            if name.lower() not in self.hop_by_hop and name.lower() != 'content-length':
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = forward
+    do_POST = forward
+
+
+class LocalServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start(handler_class):
+    """Serve handler_class on a free port in a daemon thread and return the server."""
+    server = LocalServer(('127.0.0.1', 0), handler_class)
+    thread = threading.Thread(target=server.serve_forever, name=handler_class.__name__)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def url_of(server):
+    return "http://%s:%d" % server.server_address
+
+
+def start_origin():
+    return url_of(start(OriginHandler))
+
+
+def start_proxy():
+    return url_of(start(ProxyHandler))
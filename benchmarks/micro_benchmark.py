@@ -0,0 +1,158 @@
+"""Micro-benchmarks of proxy rotation over large pools, ProxyDB quarantine churn and browser cookie import.
+
+    python benchmarks/micro_benchmark.py [--operations N] [--pool-sizes 1000,10000,100000] [--output report.json]
+"""
+import argparse
+import cookielib
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from timeit import default_timer
+
+from report import measure, print_result, summarize, write_report
+from simplewebscraper.connection import Proxy
+from simplewebscraper.cookies import Firefox
+from simplewebscraper.db_manager import ProxyDB
+from simplewebscraper.pool import LeastInFlight, PowerOfTwoChoices, RoundRobin, WeightedRandom
+
+STRATEGIES = [('round_robin', RoundRobin), ('power_of_two', PowerOfTwoChoices), ('weighted_random', WeightedRandom),
+              ('least_in_flight', LeastInFlight)]
+
+logger = logging.getLogger("benchmark")
+logger.addHandler(logging.NullHandler())
+
+
+def proxy_addresses(count, protocol='http'):
+    return ["%s://10.%d.%d.%d:%d" % (protocol, i >> 16 & 255, i >> 8 & 255, i & 255, 3128 + i % 7)
+            for i in xrange(count)]
+
+
+def proxy_rotation(pool_sizes, operations):
+    """current_proxy(True), which rotates through Proxy.__update_proxy, and release_proxies, per pick."""
+    results = []
+    for size in pool_sizes:
+        proxy = Proxy(logger)
+        proxy.use_per_proxy_count = 10 ** 9
+        proxy.proxy_pool = {'http': proxy_addresses(size), 'https': proxy_addresses(size, 'https')}
+        for name, strategy in STRATEGIES:
+            proxy.proxy_selection = strategy
+
+            def rotate():
+                proxy.release_proxies(proxy.current_proxy(True))
+            result = measure("proxy_rotation.%s.%d" % (name, size), 'proxy_rotation', rotate, operations,
+                             warmup=min(100, operations), pool_size=size, strategy=name)
+            print_result(result)
+            results.append(result)
+    return results
+
+
+def quarantine_churn(pool_size, operations):
+    """Quarantine and readmit random proxies of a pool, then prune the pool against the quarantine."""
+    database = ProxyDB()
+    proxies = proxy_addresses(pool_size)
+    random.seed(0)
+    picks = [(random.choice(('http', 'https')), random.choice(proxies), random.random() < 0.25)
+             for _ in xrange(operations)]
+    latencies = []
+    started = default_timer()
+    for protocol, socket, readmit in picks:
+        call_started = default_timer()
+        if readmit:
+            database.readmit_socket(protocol, socket)
+        else:
+            database.quarantine_socket(protocol, socket)
+        latencies.append(default_timer() - call_started)
+    churn = summarize("proxy_db.quarantine_churn.%d" % pool_size, 'proxy_db', latencies, default_timer() - started,
+                      pool_size=pool_size)
+
+    flush_started = default_timer()
+    database.flush()
+    flushed = summarize("proxy_db.flush.%d" % pool_size, 'proxy_db', [default_timer() - flush_started],
+                        default_timer() - flush_started, pool_size=pool_size, rows=operations)
+
+    socket_dict = {'http': proxies, 'https': proxies}
+    prune = measure("proxy_db.prune.%d" % pool_size, 'proxy_db', lambda: database.prune_bad_proxies(socket_dict),
+                    max(5, operations // pool_size), warmup=1, pool_size=pool_size)
+    database.close()
+    for result in (churn, flushed, prune):
+        print_result(result)
+    return [churn, flushed, prune]
+
+
+def make_firefox_profile(directory, cookies):
+    """A cookies.sqlite holding cookies rows in the moz_cookies layout Firefox uses."""
+    path = os.path.join(directory, "cookies.sqlite")
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE moz_cookies (id INTEGER PRIMARY KEY, host TEXT, path TEXT, isSecure INTEGER, '
+                       'expiry INTEGER, name TEXT, value TEXT)')
+    expiry = int(time.time()) + 30 * 24 * 3600
+    connection.executemany('INSERT INTO moz_cookies (host, path, isSecure, expiry, name, value) '
+                           'VALUES (?, ?, ?, ?, ?, ?)',
+                           [(".site%d.example.com" % (i % 500), "/", i % 2, expiry, "cookie%d" % i, "v%032d" % i)
+                            for i in xrange(cookies)])
+    connection.commit()
+    connection.close()
+    return path
+
+
+def cookie_import(cookie_counts, repeats):
+    """Firefox cookie import: copy the profile database, write the Netscape cookie file and load it into a jar."""
+    results = []
+    for count in cookie_counts:
+        profile = make_firefox_profile(os.getcwd(), count)
+
+        def import_cookies():
+            browser = Firefox.__new__(Firefox)  # Skip browser detection and read the generated profile
+            browser.cookie_file = profile
+            browser.jar = cookielib.MozillaCookieJar()
+            browser.format_cookie()
+            browser.load()
+            if len(browser.jar) != count:
+                raise AssertionError("Imported %d of %d cookies." % (len(browser.jar), count))
+        result = measure("cookie_import.firefox.%d" % count, 'cookie_import', import_cookies, repeats, warmup=1,
+                         cookies=count)
+        result['cookies_per_second'] = count * result['ops_per_second']
+        print_result(result)
+        results.append(result)
+        os.remove(profile)
+    return results
+
+
+def run(operations=20000, pool_sizes=(1000, 10000, 100000), cookie_counts=(1000, 10000), cookie_repeats=5):
+    workdir = tempfile.mkdtemp(prefix="sws-benchmark-")
+    cwd = os.getcwd()
+    os.chdir(workdir)  # ProxyDB and the cookie importers work in the current directory.
+    try:
+        results = proxy_rotation(pool_sizes, operations)
+        results.extend(quarantine_churn(max(pool_sizes), operations))
+        results.extend(cookie_import(cookie_counts, cookie_repeats))
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def integers(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operations', type=int, default=20000, help="timed operations per benchmark")
+    parser.add_argument('--pool-sizes', type=integers, default=[1000, 10000, 100000], help="comma separated")
+    parser.add_argument('--cookies', type=integers, default=[1000, 10000], help="comma separated cookie counts")
+    parser.add_argument('--cookie-repeats', type=int, default=5)
+    parser.add_argument('--output', default='-', help="JSON report file, - for stdout")
+    args = parser.parse_args()
+    results = run(args.operations, args.pool_sizes, args.cookies, args.cookie_repeats)
+    write_report(results, args.output, operations=args.operations, pool_sizes=args.pool_sizes,
+                 cookies=args.cookies, cookie_repeats=args.cookie_repeats)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
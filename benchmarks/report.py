@@ -0,0 +1,70 @@
+"""Timing helpers and the JSON report format shared by the benchmarks.
+
+A report is {"meta": {...}, "results": [{"name", "group", "operations", "seconds", "ops_per_second", "p50", "p99",
+...}]} with latencies in seconds.  compare.py matches two reports by result name.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from timeit import default_timer
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(name, group, latencies, seconds, **extra):
+    ordered = sorted(latencies)
+    result = {'name': name, 'group': group, 'operations': len(ordered), 'seconds': seconds,
+              'ops_per_second': len(ordered) / seconds if seconds else None,
+              'p50': percentile(ordered, 0.5), 'p99': percentile(ordered, 0.99)}
+    result.update(extra)
+    return result
+
+
+def measure(name, group, operation, operations, warmup=0, **extra):
+    """Call operation() warmup times untimed, then operations times, timing each call."""
+    for _ in xrange(warmup):
+        operation()
+    latencies = []
+    started = default_timer()
+    for _ in xrange(operations):
+        call_started = default_timer()
+        operation()
+        latencies.append(default_timer() - call_started)
+    return summarize(name, group, latencies, default_timer() - started, **extra)
+
+
+def print_result(result):
+    """One line summary on stderr, leaving stdout to the JSON report."""
+    sys.stderr.write("%-40s %8d ops %12.1f ops/s   p50 %9.3f ms   p99 %9.3f ms\n" % (
+        result['name'], result['operations'], result['ops_per_second'] or 0, (result['p50'] or 0) * 1000,
+        (result['p99'] or 0) * 1000))
+
+
+def git_revision():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=devnull,
+                                           cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(results, output, **settings):
+    report = {'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                       'python': platform.python_version(), 'platform': platform.platform(),
+                       'revision': git_revision(), 'settings': settings},
+              'results': results}
+    if output in (None, '-'):
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+    else:
+        with open(output, 'w') as report_file:
+            json.dump(report, report_file, indent=2, sort_keys=True)
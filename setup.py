@@ -13,6 +13,7 @@ setup(
     packages=['simplewebscraper'],
     package_dir={'simplewebscraper': 'src'},
     install_requires = ["requests[security]"],
+    extras_require={'async': ["gevent"], 'html': ["lxml"]},
     package_data={'simplewebscraper': ['README.rst']},
     author='Alexander Ward',
     author_email='alexander.ward1@gmail.com',
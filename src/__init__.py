@@ -1,13 +1,31 @@
+from async_connection import AsyncConnect
 from connection import Connect
+from extract import Schema, compile_schema
+from frontier import Frontier, canonicalize_url
+from memo import Memo
+from metrics import MetricsRegistry
+from proxy_validator import ProxyValidator
+from request import Request
+from response_cache import ResponseCache
+from retry import RetryBudget, RetryPolicy
+from throttle import RateLimiter
+from timeouts import AdaptiveTimeouts
 
 
 class Scraper(Connect):
     def __init__(self, log="simplescraper.log"):
         from logger import get_logger
-        logger = get_logger(log, maxbytes=2147483648)
+        logger = get_logger(log, maxbytes=2147483648, queued=True)
         Connect.__init__(self, logger)
 
 
+class AsyncScraper(AsyncConnect):
+    def __init__(self, log="simplescraper.log", concurrency=None):
+        from logger import get_logger
+        logger = get_logger(log, maxbytes=2147483648, queued=True)
+        AsyncConnect.__init__(self, logger, concurrency)
+
+
 class Browser(object):
     from cookies import Chrome, Firefox
     Chrome = Chrome
@@ -15,8 +33,18 @@ class Browser(object):
 
 
 class ProxyPool(object):
-    from proxy_aggregators import Hidester
+    from proxy_aggregators import Hidester, MultiSource, ProxyListURL
     Hidester = Hidester
+    MultiSource = MultiSource
+    ProxyListURL = ProxyListURL
+
+
+class ProxySelection(object):
+    from pool import RoundRobin, WeightedRandom, PowerOfTwoChoices, LeastInFlight
+    RoundRobin = RoundRobin
+    WeightedRandom = WeightedRandom
+    PowerOfTwoChoices = PowerOfTwoChoices
+    LeastInFlight = LeastInFlight
 
 
 class HTTPMethod(object):
@@ -1,11 +1,159 @@
+import socket
 import ssl
+import threading
+import time
+from collections import OrderedDict
+
 from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connection import HTTPConnection, HTTPSConnection
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from requests.packages.urllib3.poolmanager import PoolManager
+from requests.packages.urllib3.util.connection import allowed_gai_family
+from requests.packages.urllib3.util.ssl_ import create_urllib3_context
+
+from metrics import active_timings
+from settings import Defaults
+
+
+class PoolStats(object):
+    """Counts of connections taken from the pools: hits reused a kept-alive socket, misses had to open one."""
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__lock = threading.Lock()
+
+    def record(self, reused):
+        with self.__lock:
+            if reused:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def evicted(self):
+        with self.__lock:
+            self.evictions += 1
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+
+class TimedConnection(object):
+    """Records DNS and TCP connect time into the active Timings when a connection is opened."""
+    def _new_conn(self):
+        timings = active_timings()
+        host = getattr(self, '_dns_host', None)
+        if timings is None or host is None:
+            return super(TimedConnection, self)._new_conn()
+        started = time.time()
+        try:
+            addresses = socket.getaddrinfo(host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.error:
+            addresses = []
+        resolved = time.time()
+        timings.add('dns', resolved - started)
+        try:
+            if addresses:
+                # Connect to the address just resolved so the lookup is not repeated.
+                self._dns_host = addresses[0][4][0]
+                try:
+                    return super(TimedConnection, self)._new_conn()
+                except Exception:
+                    if len(addresses) == 1:
+                        raise
+                    self._dns_host = host  # Let urllib3 resolve again and try every address
+            return super(TimedConnection, self)._new_conn()
+        finally:
+            self._dns_host = host
+            timings.add('connect', time.time() - resolved)
+
+
+class TimedHTTPConnection(TimedConnection, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnection, HTTPSConnection):
+    def connect(self):
+        timings = active_timings()
+        if timings is None:
+            return HTTPSConnection.connect(self)
+        setup = timings['dns'] + timings['connect']
+        started = time.time()
+        try:
+            HTTPSConnection.connect(self)
+        finally:
+            timings.add('tls', time.time() - started - (timings['dns'] + timings['connect'] - setup))
+
+
+def counting_pool_classes(stats):
+    """urllib3 connection pool classes that record every connection they hand out in stats and time the
+    connections they open.
+    """
+    def counting(pool_class, connection_class):
+        class CountingPool(pool_class):
+            ConnectionCls = connection_class
+
+            def _get_conn(self, timeout=None):
+                conn = pool_class._get_conn(self, timeout)
+                stats.record(getattr(conn, 'sock', None) is not None)
+                return conn
+        CountingPool.__name__ = "Counting%s" % pool_class.__name__
+        return CountingPool
+    return {'http': counting(HTTPConnectionPool, TimedHTTPConnection),
+            'https': counting(HTTPSConnectionPool, TimedHTTPSConnection)}
+
+
+def modern_ssl_context():
+    context = create_urllib3_context()
+    context.options |= getattr(ssl, 'OP_NO_TLSv1', 0) | getattr(ssl, 'OP_NO_TLSv1_1', 0)
+    return context
 
 
 class SSLAdapter(HTTPAdapter):
-    def init_poolmanager(self, connections, maxsize, block=False):
+    """Session adapter for both http:// and https:// with tunable keep-alive pools.
+
+    pool_connections is the number of hosts kept pooled, pool_maxsize the connections kept per host and pool_block
+    whether to wait for a free connection rather than open an extra one.  Every proxy gets its own pool manager so
+    connections through it are reused between requests; the max_proxy_managers least recently used are kept.  TLS
+    is negotiated at version 1.2 or above.
+    """
+    def __init__(self, pool_connections=None, pool_maxsize=None, pool_block=None, max_proxy_managers=None,
+                 ssl_context=None):
+        self.stats = PoolStats()
+        self.pool_classes = counting_pool_classes(self.stats)
+        self.ssl_context = ssl_context or modern_ssl_context()
+        self.max_proxy_managers = max_proxy_managers or Defaults.adapter_max_proxy_managers
+        self.__lock = threading.Lock()
+        HTTPAdapter.__init__(self,
+                             pool_connections=pool_connections or Defaults.adapter_pool_connections,
+                             pool_maxsize=pool_maxsize or Defaults.adapter_pool_maxsize,
+                             pool_block=Defaults.adapter_pool_block if pool_block is None else pool_block)
+        self.proxy_manager = OrderedDict()
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
         self.poolmanager = PoolManager(num_pools=connections,
                                        maxsize=maxsize,
                                        block=block,
-                                       ssl_version=ssl.PROTOCOL_TLSv1)
+                                       ssl_context=self.ssl_context,
+                                       **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        with self.__lock:
+            manager = self.proxy_manager.pop(proxy, None)
+            if manager is not None:
+                self.proxy_manager[proxy] = manager
+                return manager
+            manager = HTTPAdapter.proxy_manager_for(self, proxy, ssl_context=self.ssl_context, **proxy_kwargs)
+            if not proxy.lower().startswith('socks'):
+                manager.pool_classes_by_scheme = self.pool_classes
+            while len(self.proxy_manager) > self.max_proxy_managers:
+                evicted = self.proxy_manager.popitem(last=False)[1]
+                evicted.clear()
+                self.stats.evicted()
+            return manager
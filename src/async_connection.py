@@ -0,0 +1,50 @@
+import logging
+
+from adapters import SSLAdapter
+from connection import Connect
+from settings import Defaults
+
+
+def import_gevent():
+    try:
+        import gevent.monkey
+        import gevent.pool
+    except ImportError:
+        raise Exception("You need to install gevent to use the asynchronous scraper.  "
+                        "pip install simplewebscraper[async]")
+    if not gevent.monkey.is_module_patched('socket'):
+        raise Exception("The asynchronous scraper needs cooperative sockets.  Call "
+                        "gevent.monkey.patch_all() before importing simplewebscraper.")
+    return gevent
+
+
+class AsyncConnect(Connect):
+    """Connect running every request as a greenlet on a single gevent event loop.
+
+    Proxy rotation, blacklisting and content conversion are the same Get/Post code paths used by Connect; only
+    the waiting is cooperative, so thousands of requests can be in flight without a thread per socket.
+    """
+    def __init__(self, logger=logging.getLogger(__name__), concurrency=None):
+        self.__gevent = import_gevent()
+        Connect.__init__(self, logger)
+        self.__concurrency = concurrency or Defaults.async_concurrency
+        self.mount_adapter(SSLAdapter(pool_maxsize=self.__concurrency))
+        self.__pool = self.__gevent.pool.Pool(self.__concurrency)
+
+    @property
+    def concurrency(self):
+        return self.__concurrency
+
+    def spawn(self, request):
+        """Start a request in the background and return its greenlet.  greenlet.get() returns the content."""
+        return self.__pool.spawn(self.send, request)
+
+    def fetch_many(self, requests_to_fetch, max_workers=None, ordered=True):
+        pool = self.__gevent.pool.Pool(max_workers or self.__concurrency)
+        if ordered:
+            return pool.map(self._fetch_result, requests_to_fetch)
+        return pool.imap_unordered(self._fetch_result, requests_to_fetch)
+
+    def join(self, timeout=None):
+        """Wait for every request started with spawn to finish."""
+        self.__pool.join(timeout=timeout)
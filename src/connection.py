@@ -1,27 +1,52 @@
-import StringIO
 import abc
 import cookielib
-import gzip
 import logging
 import os
 import re
+import threading
+import time
 import urllib
-import zlib
+import urlparse
+import uuid
+from multiprocessing.pool import ThreadPool
 
 import errno
+import itertools
 import requests  # pip install requests[security]
-import json
+from requests.packages.urllib3.exceptions import NewConnectionError
 
 from adapters import SSLAdapter
-from convert_response import ToJSON, ToXML
+from convert_response import ToJSON, ToXML, iter_json_items, iter_xml_elements
 from cookies import CookieJar
 from db_manager import ProxyDB
-from proxy_aggregators import ProxyPool
+from decoders import iter_decoded, read_decoded
+from proxy_aggregators import Aggregator, ProxyPool, aggregator_instance
+from proxy_validator import ProxyValidator
+from request import Request, Result
+from response_cache import ResponseCache
+from retry import RetryPolicy
 from settings import Defaults
+from throttle import RateLimiter
+from timeouts import AdaptiveTimeouts
 from enumerations import HTTPMethods
+from extract import Schema
+from memo import Memo
+from metrics import MetricsRegistry, RequestMetrics, Timings, set_active_timings
+from pool import IndexedProxyPool, RoundRobin, SelectionStrategy
+from pool_refresher import PoolRefresher
 
 requests.packages.urllib3.disable_warnings()
 
+request_ids = itertools.count()
+
+
+def is_unreachable(exc):
+	"""True if exc means that the proxy, or the host when there is none, could not be connected to at all."""
+	if isinstance(exc, (requests.exceptions.ProxyError, requests.exceptions.ConnectTimeout)):
+		return True
+	reason = getattr(exc.args[0], 'reason', None) if exc.args else None
+	return isinstance(reason, NewConnectionError)
+
 
 class Proxy(object):
 	def __init__(self, logger):
@@ -30,6 +55,10 @@ class Proxy(object):
 		self.logger.setLevel(Defaults.logging_level)
 		self.__use_per_proxy_count = Defaults.use_per_proxy_count
 		self.__current_proxy = {}
+		self.__proxy_lock = threading.RLock()
+		self.__proxy_selection = RoundRobin()
+		self.__proxy_validator = None
+		self.__pool_refresher = None
 
 	@property
 	def proxy_pool(self):
@@ -37,20 +66,91 @@ class Proxy(object):
 
 	@proxy_pool.setter
 	def proxy_pool(self, new_pool):
-		if isinstance(new_pool, ProxyPool):
-			self.logger.info("Generating ProxyPool from %s." % new_pool.__name__)
-			new_pool = new_pool().generate_pool()
+		if isinstance(new_pool, (ProxyPool, Aggregator)):
+			aggregator = aggregator_instance(new_pool)
+			self.logger.info("Generating ProxyPool from %s.", type(aggregator).__name__)
+			new_pool = aggregator.generate_pool()
 			self.logger.info("ProxyPool ready")
-		if isinstance(new_pool, dict) and ("http" in new_pool or "https" in new_pool):
-			for protocol, proxies in new_pool.iteritems():
-				self.__pool[protocol] = []
-				for proxy in proxies:
-					if not (proxy.lower().startswith("http://") or proxy.lower().startswith("https://")):
-						raise ValueError
-					else:
-						self.__pool[protocol].append({'proxy': proxy, 'count': 0})
+		pool = self.build_pool(new_pool)
+		with self.__proxy_lock:
+			self.__pool = pool
+			self.__current_proxy = {}
+		for protocol, proxies in pool.iteritems():
+			self.proxy_db.record_pool_size(protocol, len(proxies), force=True)
+
+	def build_pool(self, new_pool):
+		"""Turn a {protocol: [proxy, ...]} dictionary into IndexedProxyPools, probing it first if a validator is set."""
+		if not (isinstance(new_pool, dict) and ("http" in new_pool or "https" in new_pool)):
+			raise TypeError
+		for protocol, proxies in new_pool.iteritems():
+			for proxy in proxies:
+				if not (proxy.lower().startswith("http://") or proxy.lower().startswith("https://")):
+					raise ValueError
+		if self.proxy_validator is None:
+			return dict((protocol, IndexedProxyPool(proxies)) for protocol, proxies in new_pool.iteritems())
+
+		self.logger.info("Validating %d proxies.", sum(len(proxies) for proxies in new_pool.itervalues()))
+		responsive, failed = self.proxy_validator.validate(new_pool)
+		for protocol, proxy in failed:
+			self.proxy_db.quarantine_socket(protocol, proxy)
+		pool = {}
+		for protocol, proxies in responsive.iteritems():
+			pool[protocol] = IndexedProxyPool()
+			for proxy, latency in proxies:
+				pool[protocol].add(proxy, latency)
+		self.logger.info("%d proxies responded, %d failed.", sum(len(p) for p in pool.itervalues()), len(failed))
+		return pool
+
+	def merge_pool(self, pool):
+		"""Add the proxies of another built pool to the live one without disturbing requests in flight."""
+		added = 0
+		with self.__proxy_lock:
+			for protocol, new_proxies in pool.iteritems():
+				live = self.__pool.setdefault(protocol, IndexedProxyPool())
+				for entry in new_proxies.entries:
+					if entry.proxy not in live:
+						live.add(entry.proxy, entry.latency)
+						added += 1
+			sizes = [(protocol, len(proxies)) for protocol, proxies in self.__pool.iteritems()]
+		for protocol, size in sizes:
+			self.proxy_db.record_pool_size(protocol, size, force=True)
+		return added
+
+	def start_pool_refresher(self, aggregator, low_water_mark=None, interval=None, wait=True):
+		"""Refill the proxy pool from aggregator in the background whenever it runs low or grows stale.
+
+		With wait the first fill happens before returning, as when setting proxy_pool.  Without it the call returns
+		at once and, until the first fill lands, requests fail with an empty pool rather than going out unproxied.
+		"""
+		self.stop_pool_refresher()
+		self.__pool_refresher = PoolRefresher(self, aggregator, low_water_mark, interval)
+		if wait:
+			self.__pool_refresher.refresh()
 		else:
+			with self.__proxy_lock:
+				for protocol in ('http', 'https'):
+					self.__pool.setdefault(protocol, IndexedProxyPool())
+		self.__pool_refresher.start()
+		return self.__pool_refresher
+
+	def stop_pool_refresher(self):
+		if self.__pool_refresher is not None:
+			self.__pool_refresher.stop()
+			self.__pool_refresher = None
+
+	@property
+	def proxy_validator(self):
+		return self.__proxy_validator
+
+	@proxy_validator.setter
+	def proxy_validator(self, validator):
+		if validator is not None and not isinstance(validator, ProxyValidator):
 			raise TypeError
+		self.__proxy_validator = validator
+
+	@property
+	def proxy_db(self):
+		return ProxyDB.shared()
 
 	@property
 	def use_per_proxy_count(self):
@@ -63,44 +163,66 @@ class Proxy(object):
 		else:
 			raise TypeError
 
-	def current_proxy(self, increment=False):
-		if increment:
-			self.__current_proxy = self.__update_proxy()
-		return self.__current_proxy
-
-	def expire_proxy(self, protocol):
-		proxy_to_expire = self.current_proxy()[protocol]
-		self.proxy_pool[protocol].pop(self.__find_pool_index(protocol, proxy_to_expire))
-		self.__current_proxy[protocol] = ""
+	@property
+	def proxy_selection(self):
+		return self.__proxy_selection
+
+	@proxy_selection.setter
+	def proxy_selection(self, strategy):
+		if isinstance(strategy, type) and issubclass(strategy, SelectionStrategy):
+			strategy = strategy()
+		if not isinstance(strategy, SelectionStrategy):
+			raise TypeError
+		self.__proxy_selection = strategy
 
-	def __find_pool_index(self, protocol, proxy):
-		return dict((d["proxy"], i) for (i, d) in enumerate(self.proxy_pool[protocol]))[proxy]
+	def current_proxy(self, increment=False):
+		with self.__proxy_lock:
+			if increment:
+				self.__current_proxy = self.__update_proxy()
+			return dict(self.__current_proxy)
+
+	def expire_proxy(self, protocol, proxy=None):
+		with self.__proxy_lock:
+			if proxy is None:
+				proxy = self.__current_proxy.get(protocol)
+			if not proxy:
+				return
+			if protocol in self.proxy_pool and self.proxy_pool[protocol].remove(proxy):
+				self.proxy_db.record_pool_size(protocol, len(self.proxy_pool[protocol]))
+			if self.__current_proxy.get(protocol) == proxy:
+				self.__current_proxy[protocol] = ""
+
+	def report_proxy(self, protocol, proxy, latency=None, unreachable=False):
+		"""Feed the outcome of a request into the proxy's health score.  latency is None for a failure.
+
+		A proxy that could not be connected to at all is quarantined and expired at once.  Any other failing proxy
+		is moved to the back of the rotation and stays in the pool, where its falling score steers the scoring
+		strategies away from it, until Defaults.proxy_max_failures requests through it have failed in a row; it is
+		then quarantined and expired.  Returns True if the proxy was expired.
+		"""
+		with self.__proxy_lock:
+			pool = self.proxy_pool.get(protocol)
+			entry = pool.record(proxy, latency) if pool is not None and proxy else None
+			if entry is None or latency is not None:
+				return False
+			if not unreachable and entry.consecutive_failures < Defaults.proxy_max_failures:
+				pool.demote(proxy)
+				return False
+		self.proxy_db.quarantine_socket(protocol, proxy)
+		self.expire_proxy(protocol, proxy)
+		return True
+
+	def release_proxies(self, proxies):
+		"""Mark the proxies handed out by current_proxy(True) as no longer in flight."""
+		with self.__proxy_lock:
+			for protocol, proxy in proxies.iteritems():
+				if proxy and protocol in self.proxy_pool:
+					self.proxy_pool[protocol].release(proxy)
 
 	def __update_proxy(self):
 		proxy_group = dict(https="", http="")
-		if not self.__current_proxy:
-			for protocol, proxy in self.proxy_pool.iteritems():
-				proxy_group[protocol] = proxy[0]["proxy"]
-				try:
-					proxy_group[protocol] = proxy[0]["proxy"]
-					proxy[0]['count'] += 1
-				except IndexError:
-					pass
-		else:
-			for protocol, proxy in self.__current_proxy.iteritems():
-				if proxy:
-					pool_index = self.__find_pool_index(protocol, proxy)
-					if self.proxy_pool[protocol][pool_index]["count"] == self.use_per_proxy_count:
-						self.proxy_pool[protocol].pop(pool_index)
-						if self.proxy_pool[protocol]:
-							self.proxy_pool[protocol][0]["count"] += 1
-							proxy_group[protocol] = self.proxy_pool[protocol][0]["proxy"]
-					else:
-						self.proxy_pool[protocol][pool_index]["count"] += 1
-						proxy_group[protocol] = self.proxy_pool[protocol][pool_index]["proxy"]
-				else:
-					self.proxy_pool[protocol][0]["count"] += 1
-					proxy_group[protocol] = self.proxy_pool[protocol][0]["proxy"]
+		for protocol, pool in self.proxy_pool.iteritems():
+			proxy_group[protocol] = pool.acquire(self.use_per_proxy_count, self.proxy_selection) or ""
 		return proxy_group
 
 
@@ -109,7 +231,7 @@ class Connect(Proxy):
 		Proxy.__init__(self, logger)
 		self.jar = cookielib.CookieJar()
 		self.requestSession = requests.Session()
-		self.requestSession.mount('https://', SSLAdapter())
+		self.mount_adapter(SSLAdapter())
 		self.logger = logger
 		self.logger.setLevel(Defaults.logging_level)
 
@@ -120,6 +242,23 @@ class Connect(Proxy):
 		self.headers = Defaults.request_headers
 		self._response_headers = {}
 		self.__download_path = Defaults.download_path
+		self.__retry_policy = RetryPolicy()
+		self.__rate_limiter = RateLimiter()
+		self.__response_cache = None
+		self.__memo = None
+		self.__extraction_schema = None
+		self.__metrics = None
+		self._request_metrics = None
+		self._timings = None
+		self.__timeouts = AdaptiveTimeouts()
+
+	def mount_adapter(self, adapter):
+		self.requestSession.mount('https://', adapter)
+		self.requestSession.mount('http://', adapter)
+
+	@property
+	def pool_stats(self):
+		return getattr(self.requestSession.get_adapter('http://'), 'stats', None)
 
 	@property
 	def cookies(self):
@@ -129,7 +268,7 @@ class Connect(Proxy):
 	def cookies(self, cookie_object):
 		if isinstance(cookie_object, CookieJar):
 			self.jar = cookie_object().jar
-			self.logger.info("%s cookies loaded." % cookie_object.__name__)
+			self.logger.info("%s cookies loaded.", cookie_object.__name__)
 
 	@property
 	def HTTP_mode(self):
@@ -174,6 +313,82 @@ class Connect(Proxy):
 			raise TypeError
 		self.__parameters = params
 
+	@property
+	def retry_policy(self):
+		return self.__retry_policy
+
+	@retry_policy.setter
+	def retry_policy(self, policy):
+		if not isinstance(policy, RetryPolicy):
+			raise TypeError
+		self.__retry_policy = policy
+
+	@property
+	def rate_limiter(self):
+		return self.__rate_limiter
+
+	@rate_limiter.setter
+	def rate_limiter(self, limiter):
+		if not isinstance(limiter, RateLimiter):
+			raise TypeError
+		self.__rate_limiter = limiter
+
+	@property
+	def response_cache(self):
+		return self.__response_cache
+
+	@response_cache.setter
+	def response_cache(self, cache):
+		if cache is not None and not isinstance(cache, ResponseCache):
+			raise TypeError
+		self.__response_cache = cache
+
+	@property
+	def timeouts(self):
+		return self.__timeouts
+
+	@timeouts.setter
+	def timeouts(self, timeouts):
+		if timeouts is not None and not isinstance(timeouts, AdaptiveTimeouts):
+			raise TypeError
+		self.__timeouts = timeouts
+
+	@property
+	def metrics(self):
+		return self.__metrics
+
+	@metrics.setter
+	def metrics(self, registry):
+		if registry is not None and not isinstance(registry, MetricsRegistry):
+			raise TypeError
+		self.__metrics = registry
+		self._request_metrics = RequestMetrics(registry) if registry is not None else None
+
+	@property
+	def timings(self):
+		"""The phase Timings of the last request attempt."""
+		return self._timings
+
+	@property
+	def extraction_schema(self):
+		return self.__extraction_schema
+
+	@extraction_schema.setter
+	def extraction_schema(self, schema):
+		if schema is not None and not isinstance(schema, Schema):
+			raise TypeError
+		self.__extraction_schema = schema
+
+	@property
+	def memo(self):
+		return self.__memo
+
+	@memo.setter
+	def memo(self, memo):
+		if memo is not None and not isinstance(memo, Memo):
+			raise TypeError
+		self.__memo = memo
+
 	@property
 	def download_path(self):
 		return self.__download_path
@@ -185,168 +400,360 @@ class Connect(Proxy):
 		else:
 			raise ValueError("Not a valid directory.")
 
-	def fetch(self):
-		if not self.url:
-			raise Exception("Please supply a URL to fetch.")
+	def prepare_request(self):
+		return Request(self.url, self.HTTP_mode, self.parameters)
+
+	def connection_for(self, request):
+		if request.HTTP_mode == HTTPMethods.GET:
+			return Get(self, request)
+		return Post(self, request)
+
+	def send(self, request, stream_path=None):
+		if stream_path is not None:
+			connection = self.connection_for(request)
+			connection.stream_path = stream_path
+			return connection.connect()
+		return self.__connect(self.connection_for(request))[0]
+
+	def fetch(self, stream_path=None):
+		"""Fetch the current url and return its converted content.
+
+		With stream_path set, a JSON response is instead returned as an iterator over the items of the array at
+		that path ("" for the top level array), and an XML response as an iterator over the elements matching that
+		tag or path ("" for the children of the root).  Both are parsed as they arrive so only one item is held in
+		memory.
+		"""
+		return self.send(self.prepare_request(), stream_path)
+
+	def fetch_many(self, requests_to_fetch, max_workers=None, ordered=True):
+		"""Run several Requests concurrently over the shared session.
+
+		Returns a list of Result objects in input order, or when ordered is False an iterator yielding them
+		as they complete.  A failing request is reported on its own Result and does not affect the others.
+		"""
+		requests_to_fetch = list(requests_to_fetch)
+		workers = max(1, min(max_workers or Defaults.max_workers, len(requests_to_fetch)))
+		pool = ThreadPool(workers)
+		try:
+			if ordered:
+				return pool.map(self._fetch_result, requests_to_fetch)
+			return pool.imap_unordered(self._fetch_result, requests_to_fetch)
+		finally:
+			pool.close()
+
+	def crawl(self, frontier, callback, max_workers=None, batch_size=None):
+		"""Fetch URLs popped from frontier until it runs dry.
+
+		callback(result) receives the Result of every fetch, failed or not, and may return new URLs (or
+		(url, priority) pairs) to push onto the frontier.  Fetched URLs are then marked done or failed.
+		"""
+		batch_size = batch_size or max_workers or Defaults.max_workers
+		while 1:
+			urls = frontier.pop(batch_size)
+			if not urls:
+				break
+			for result in self.fetch_many([Request(url) for url in urls], max_workers, ordered=False):
+				for found in callback(result) or ():
+					if isinstance(found, tuple):
+						frontier.push(*found)
+					else:
+						frontier.push(found)
+				if result.ok:
+					frontier.done(result.request.url)
+				else:
+					frontier.failed(result.request.url)
+		frontier.checkpoint()
+
+	def _fetch_result(self, request):
+		connection = None
+		try:
+			connection = self.connection_for(request)
+			content, response_headers = self.__connect(connection)
+			return Result(request, content, response_headers, None, connection.timings)
+		except Exception as exc:
+			if connection is None:
+				return Result(request, None, {}, exc)
+			return Result(request, None, connection.response_headers, exc, connection.timings)
 
-		if self.HTTP_mode == HTTPMethods.GET:
-			connection = Get(self)
-		elif self.HTTP_mode == HTTPMethods.POST:
-			connection = Post(self)
-		else:
-			raise KeyError("Please enter a valid HTTP method.  GET or POST.")
 
-		return connection.connect()
+	def __connect(self, connection):
+		"""Run connection and return (content, response headers), through the memo for GETs when one is set."""
+		if self.memo is None or not connection.cacheable:
+			return connection.connect(), connection.response_headers
+		return self.memo.get_or_call(connection.request,
+									 lambda: (connection.connect(), connection.response_headers))
 
 
 class AbstractConnection(object):
 	__metaclass__ = abc.ABCMeta
+	cacheable = False
 
-	def __init__(self, connection_object):
+	def __init__(self, connection_object, request=None):
 		self.connection = connection_object
+		self.request = request or connection_object.prepare_request()
+		self.response_headers = {}
+		self.conditional_headers = {}
+		self.stream_path = None
+		self.log_extra = {'request_id': next(request_ids)}
+		self.timings = Timings()
+		self.timeout = (Defaults.connection_timeout_length, Defaults.read_timeout_length)
+
+	def log(self, message, *args):
+		"""Log a per-request line, formatted only if it is written and sampled as one request by SamplingFilter."""
+		self.connection.logger.info(message, *args, extra=self.log_extra)
 
 	@abc.abstractmethod
-	def connect(self):
+	def format_parameters(self, params):
 		pass
 
 	@abc.abstractmethod
-	def format_parameters(self, params):
+	def prepare_url(self):
+		pass
+
+	@abc.abstractmethod
+	def issue(self, url, proxies):
+		"""Send the request through proxies and return the streamed requests.Response."""
 		pass
 
-	def download_file(self, content_type, content, **kwargs):
-		filename = self.connection.url.split('/')[-1]
-		extension = content_type.split('/')[1].lower()
+	def connect(self):
+		url = self.prepare_url()
+		protocol = re.match("(\w+)://", url).group(1)
+		host = urlparse.urlparse(url).netloc
+		policy = self.connection.retry_policy
+		timeouts = self.connection.timeouts
+		retry = policy.begin()
+		cache_key, cached = self.cached_entry()
+		if cached:
+			self.conditional_headers = self.connection.response_cache.conditional_headers(cached)
+		delay = 0
+		while 1:
+			# Back off only once the last attempt has given back its concurrency slot and its proxy.
+			if delay:
+				time.sleep(delay)
+			proxies = self.connection.current_proxy(True)
+			proxy = proxies.get(protocol, "")
+			if protocol in self.connection.proxy_pool and not proxy:
+				self.connection.release_proxies(proxies)
+				delay = retry.next_delay()
+				if delay is not None:
+					continue  # A pool refresher may refill the pool in the meantime
+				raise IndexError("The %s proxy pool is empty." % protocol)
+			if proxy:
+				self.log("%s: %s via Proxy - %s.", self.method, url, proxy)
+			else:
+				self.log("%s: %s.", self.method, url)
+			try:
+				self.connection.rate_limiter.acquire(host, proxy)
+			except BaseException:
+				self.connection.release_proxies(proxies)
+				raise
+			if timeouts is not None:
+				self.timeout = timeouts.timeout(host)
+			timings = self.timings = self.connection._timings = Timings()
+			outcome = None
+			started = time.time()
+			set_active_timings(timings)
+			try:
+				response = self.issue(url, proxies)
+				set_active_timings(None)
+				timings.response_received(response.elapsed.total_seconds())
+				outcome = "%dxx" % (response.status_code // 100)
+				if timeouts is not None:
+					timeouts.observe(host, response.elapsed.total_seconds())
+				self.connection.rate_limiter.observe(host, response)
+				# A retryable server error through a proxy counts against the proxy.
+				expired = False
+				if response.status_code >= 500 and response.status_code in policy.statuses:
+					expired = self.connection.report_proxy(protocol, proxy)
+				else:
+					self.connection.report_proxy(protocol, proxy, response.elapsed.total_seconds())
+				if response.status_code in policy.statuses:
+					delay = retry.next_delay(counted=not expired)
+					if delay is not None:
+						self.log("%s: Status %d, retrying.", self.method, response.status_code)
+						response.close()
+						continue
+					self.read_body(response)
+					raise requests.exceptions.HTTPError("Status %d after retrying." % response.status_code,
+														response=response)
+				converting = time.time()
+				results = self.convert(self.revalidate(url, response, cache_key, cached))
+				timings.add('convert', max(0.0, time.time() - converting - timings['transfer']))
+				self.log("%s: Successful.", self.method)
+				return results
+			except policy.exceptions as exc:
+				outcome = type(exc).__name__
+				self.log("%s: Failed.", self.method)
+				if timeouts is not None and isinstance(exc, requests.exceptions.ReadTimeout):
+					timeouts.observe(host, self.timeout[1])
+				expired = self.connection.report_proxy(protocol, proxy, unreachable=is_unreachable(exc))
+				# An expired proxy has been rotated out, so the retry goes through a fresh proxy at once and is not
+				# counted as another attempt at the same route.
+				delay = retry.next_delay(backoff=not expired, counted=not expired)
+				if delay is None:
+					raise
+			except Exception as exc:
+				outcome = type(exc).__name__
+				raise
+			finally:
+				set_active_timings(None)
+				if self.connection._request_metrics is not None:
+					self.connection._request_metrics.record(host, proxy, self.method, outcome or "error",
+															time.time() - started, timings)
+				self.connection.rate_limiter.release()
+				self.connection.release_proxies(proxies)
+
+	def read_body(self, response):
+		started = time.time()
+		try:
+			return read_decoded(response)
+		finally:
+			self.timings.add('transfer', time.time() - started)
+
+	def cached_entry(self):
+		cache = self.connection.response_cache
+		if cache is None or not self.cacheable:
+			return None, None
+		key = cache.key(self.method, self.request)
+		return key, cache.get(key)
+
+	def revalidate(self, url, response, cache_key, cached):
+		"""Serve a 304 from the response cache, and store a fresh response that can be revalidated later."""
+		if cache_key is None:
+			return response
+		cache = self.connection.response_cache
+		if response.status_code == 304 and cached:
+			response.close()
+			self.log("%s: Not modified, served from cache.", self.method)
+			return cache.as_response(cached, url)
+		if self.stream_path is None and cache.is_cacheable(response) and not self.is_download(response.headers.get('content-type', '')):
+			self.read_body(response)
+			cache.put(cache_key, url, response)
+		return response
+
+	def download_file(self, content_type, response):
+		filename = self.request.url.split('/')[-1].split('?')[0]
+		extension = content_type.split('/')[1].split(';')[0].strip().lower()
 		if '.' not in filename.lower():
 			filename += '.%s' % extension
-		if kwargs.pop('zip', False):
-			data = StringIO.StringIO(content).read()
-		else:
-			data = content
 
-		domain = re.match(r"^.*://(.*)",self.connection.url).group(1).split('/')[0]
+		domain = re.match(r"^.*://(.*)",self.request.url).group(1).split('/')[0]
 
-		filename = "%s/%s" % (domain,filename)
-		if not os.path.exists(os.path.dirname(filename)):
+		path = os.path.abspath(os.path.join(self.connection.download_path, domain, filename))
+		if not os.path.exists(os.path.dirname(path)):
 			try:
-				os.makedirs(os.path.dirname(filename))
+				os.makedirs(os.path.dirname(path))
 			except OSError as exc: # Guard against race condition
 				if exc.errno != errno.EEXIST:
 					raise
 
-		path = os.path.abspath(os.path.join(self.connection.download_path, filename))
-		with open(path, 'wb+') as objFile:
-			objFile.write(data)
-		self.connection.logger.info("Content parsed. File downloaded to \"%s\"." % path)
+		# Stream into a temporary file beside the target so a partial download never replaces a complete one.
+		temp_path = "%s.%s.part" % (path, uuid.uuid4().hex)
+		started = time.time()
+		try:
+			with open(temp_path, 'wb') as objFile:
+				for chunk in iter_decoded(response, max_size=0):
+					objFile.write(chunk)
+			if os.name == 'nt' and os.path.exists(path):
+				os.remove(path)
+			os.rename(temp_path, path)
+		except BaseException:
+			if os.path.exists(temp_path):
+				os.remove(temp_path)
+			raise
+		finally:
+			response.close()
+			self.timings.add('transfer', time.time() - started)
+		self.log("Content parsed. File downloaded to \"%s\".", path)
 
 	def convert(self, response):
 		content = None
 		if response.headers:
+			self.response_headers = response.headers
 			self.connection._response_headers = response.headers
-			content = response.content
-			if response.headers.get('Content-Encoding') == 'gzip':
-				try:
-					content = gzip.GzipFile(fileobj=StringIO.StringIO(content)).read()
-				except IOError:
-					content = content
-			elif response.headers.get('Content-Encoding') == 'deflate':
-				content = zlib.decompress(content)
-			content_type = response.headers['content-type']
+			content_type = response.headers.get('content-type', '')
+			if self.is_download(content_type):
+				self.download_file(content_type, response)
+				return None
+			if self.stream_path is not None and 'application/json' in content_type:
+				self.log("Content parsed. Streaming JSON items.")
+				# Only one item is held at a time, so a stream may run as long as the feed does.
+				return iter_json_items(iter_decoded(response, max_size=0), self.stream_path)
+			if self.stream_path is not None and self.is_xml(content_type):
+				self.log("Content parsed. Streaming XML elements.")
+				return iter_xml_elements(iter_decoded(response, max_size=0), self.stream_path)
+			content = self.read_body(response)
 			if 'application/json' in content_type:
-				content = ToJSON(content)
-				if isinstance(content, json):
-					self.connection.logger.info("Content parsed. JSON object returned.")
+				parsed = ToJSON(content)
+				if parsed is not content:
+					self.log("Content parsed. JSON object returned.")
 				else:
-					self.connection.logger.info("Content parsed. JSON conversion failed.  String returned.")
-			elif 'text/xml' in content_type:
+					self.log("Content parsed. JSON conversion failed.  String returned.")
+				content = parsed
+			elif self.is_xml(content_type):
 				content = ToXML(content)
-				self.connection.logger.info("Content parsed. XML object returned.")
-			elif 'image/' in content_type:
-				self.download_file(content_type, content)
-				content = None
-			elif 'application/' in content_type:
-				self.download_file(content_type, content, zip=True)
-				content = None
-			elif 'video/' in content_type:
-				self.download_file(content_type, content)
-				content = None
+				self.log("Content parsed. XML object returned.")
+			elif 'text/html' in content_type and self.connection.extraction_schema is not None:
+				charset = re.search(r"charset=([\w.:-]+)", content_type)
+				content = self.connection.extraction_schema.extract(content, charset.group(1) if charset else 'utf-8')
+				self.log("Content parsed. %d records extracted.", len(content))
 
 		return content
 
+	@staticmethod
+	def is_xml(content_type):
+		content_type = content_type.split(';')[0].strip().lower()
+		return content_type in ('text/xml', 'application/xml') or content_type.endswith('+xml')
+
+	@classmethod
+	def is_download(cls, content_type):
+		if 'application/json' in content_type or cls.is_xml(content_type):
+			return False
+		return 'image/' in content_type or 'application/' in content_type or 'video/' in content_type
+
 
 class Get(AbstractConnection):
-	def __init__(self, connection_object):
-		super(Get, self).__init__(connection_object)
+	method = "GET"
+	cacheable = True
+
+	def __init__(self, connection_object, request=None):
+		super(Get, self).__init__(connection_object, request)
 
 	def format_parameters(self, params):
-		params = self.connection.parameters
 		if params:
 			return "?%s" % urllib.urlencode(params)
 		else:
 			return ""
 
-	def connect(self):
-		url = self.connection.url
-		url += self.format_parameters(self.connection.parameters)
-		protocol = re.match("(\w+)://", url).group(1)
-		results = None
-		while 1:
-			proxies = self.connection.current_proxy(True)
-			if len(proxies['http']) > 0 or len(proxies['https']) > 0:
-				self.connection.logger.info("GET: %s via Proxy - %s." % (url, proxies[protocol]))
-			else:
-				self.connection.logger.info("GET: %s." % url)
-			try:
-				results = self.convert(
-					self.connection.requestSession.get(url, cookies=self.connection.jar,
-													   headers=self.connection.headers,
-													   proxies=proxies,
-													   verify=False, timeout=Defaults.connection_timeout_length,
-													   stream=True))
-				self.connection.logger.info("GET: Successful.")
-				break
-			except (
-					requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout,
-					requests.exceptions.TooManyRedirects, requests.exceptions.SSLError):
-				self.connection.logger.info("GET: Failed.")
-				ProxyDB().blacklist_socket(protocol, proxies[protocol])
-				self.connection.expire_proxy(protocol)
+	def prepare_url(self):
+		return self.request.url + self.format_parameters(self.request.parameter_dict)
 
-		return results
+	def issue(self, url, proxies):
+		return self.connection.requestSession.get(url, cookies=self.connection.jar,
+												  headers=dict(self.request.header_dict, **self.conditional_headers),
+												  proxies=proxies,
+												  verify=False, timeout=self.timeout,
+												  stream=True)
 
 
 class Post(AbstractConnection):
-	def __init__(self, connection_object):
-		super(Post, self).__init__(connection_object)
-		self.connection = connection_object
+	method = "POST"
+
+	def __init__(self, connection_object, request=None):
+		super(Post, self).__init__(connection_object, request)
 
 	def format_parameters(self, params):
 		return params
 
-	def connect(self):
-		url = self.connection.url
-		protocol = re.match("(\w+)://", url).group(1)
-		results = None
-		while 1:
-			proxies = self.connection.current_proxy(True)
-			if len(proxies['http']) > 0 or len(proxies['https']) > 0:
-				self.connection.logger.info("POST: %s via Proxy - %s." % (url, proxies[protocol]))
-			else:
-				self.connection.logger.info("POST: %s." % url)
-			try:
-				results = self.convert(self.connection.requestSession.post(url,
-																		   data=self.format_parameters(
-																			   self.connection.parameters),
-																		   cookies=self.connection.jar,
-																		   headers=self.connection.headers,
-																		   proxies=proxies,
-																		   verify=False,
-																		   timeout=Defaults.connection_timeout_length))
-				self.connection.logger.info("POST: Successful.")
-				break
-			except (
-					requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout,
-					requests.exceptions.TooManyRedirects, requests.exceptions.SSLError):
-				self.connection.logger.info("POST: failed.")
-				ProxyDB().blacklist_socket(protocol, proxies[protocol])
-				self.connection.expire_proxy(protocol)
-		return results
+	def prepare_url(self):
+		return self.request.url
+
+	def issue(self, url, proxies):
+		return self.connection.requestSession.post(url,
+												   data=self.format_parameters(self.request.parameter_dict),
+												   cookies=self.connection.jar,
+												   headers=self.request.header_dict,
+												   proxies=proxies,
+												   verify=False,
+												   timeout=self.timeout,
+												   stream=True)
@@ -1,5 +1,10 @@
 import json
-from xml.dom.minidom import parse, parseString
+import re
+
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
 
 
 def ToJSON(data):
@@ -10,7 +15,224 @@ def ToJSON(data):
         return data
 
 
+class JSONStream(object):
+    """JSON text read from an iterator of chunks, keeping only the part still being scanned in memory."""
+    non_space = re.compile(r'\S')
+    structural = re.compile(r'["\[\]{}]')
+    string_end = re.compile(r'["\\]')
+    scalar_end = re.compile(r'[\s,\]}]')
+    delimiters = frozenset(' \t\r\n,]}')
+    decoder = json.JSONDecoder()
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = ""
+        self.position = 0
+        self.mark = None
+
+    def fill(self):
+        """Append the next chunk, dropping text already scanned.  Returns False at the end of the input."""
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        start = self.position if self.mark is None else self.mark
+        self.buffer = self.buffer[start:] + chunk
+        self.position -= start
+        if self.mark is not None:
+            self.mark = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character, or "" at the end of the input."""
+        while 1:
+            match = self.non_space.search(self.buffer, self.position)
+            if match:
+                self.position = match.start()
+                return self.buffer[self.position]
+            self.position = len(self.buffer)
+            if not self.fill():
+                return ""
+
+    def expect(self, characters):
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError("Expected one of %r in the JSON stream, found %r." % (characters, character))
+        self.position += 1
+        return character
+
+    def scan_string(self):
+        self.position += 1
+        while 1:
+            match = self.string_end.search(self.buffer, self.position)
+            if match is None:
+                self.position = len(self.buffer)
+            elif match.group() == '"':
+                self.position = match.end()
+                return
+            elif match.end() < len(self.buffer):
+                self.position = match.end() + 1
+                continue
+            else:
+                self.position = match.start()  # Rescan the backslash once the escaped character has arrived
+            if not self.fill():
+                raise ValueError("Unterminated string in the JSON stream.")
+
+    def scan_value(self):
+        """Move past the value starting at the current position."""
+        character = self.peek()
+        if character == '"':
+            self.scan_string()
+        elif character in ('[', '{'):
+            self.position += 1
+            depth = 1
+            while depth:
+                match = self.structural.search(self.buffer, self.position)
+                if match is None:
+                    self.position = len(self.buffer)
+                    if not self.fill():
+                        raise ValueError("Unterminated value in the JSON stream.")
+                elif match.group() == '"':
+                    self.position = match.start()
+                    self.scan_string()
+                else:
+                    depth += 1 if match.group() in '[{' else -1
+                    self.position = match.end()
+        elif character:
+            while 1:
+                match = self.scalar_end.search(self.buffer, self.position)
+                if match is not None:
+                    self.position = match.start()
+                    return
+                self.position = len(self.buffer)
+                if not self.fill():
+                    return
+        else:
+            raise ValueError("Unexpected end of the JSON stream.")
+
+    def read_value(self):
+        character = self.peek()
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.position)
+            # A number cut by the end of a chunk ("1." of "1.5") also decodes, so a scalar only counts as complete
+            # when a delimiter follows it.
+            if end < len(self.buffer) and (character in '"[{' or self.buffer[end] in self.delimiters):
+                self.position = end
+                return value
+        except ValueError:
+            pass
+        # The value runs past the end of the buffer (or is invalid), so find its end before decoding it.
+        self.mark = self.position
+        try:
+            self.scan_value()
+            return json.loads(self.buffer[self.mark:self.position])
+        finally:
+            self.mark = None
+
+    def find(self, key):
+        """Move to the value at key of the object, or index of the array, starting here.  False if it is absent."""
+        if self.peek() == '[' and key.isdigit():
+            self.position += 1
+            for index in xrange(int(key)):
+                if self.peek() == ']':
+                    return False
+                self.scan_value()
+                if self.expect(',]') == ']':
+                    return False
+            return self.peek() not in (']', '')
+        if self.peek() != '{':
+            return False
+        self.position += 1
+        while self.peek() == '"':
+            name = self.read_value()
+            self.expect(':')
+            if name == key:
+                return True
+            self.scan_value()
+            if self.expect(',}') == '}':
+                return False
+        return False
+
+
+def iter_json_items(chunks, path=""):
+    """Yield the items of the JSON array at path as they are parsed from chunks.
+
+    path is a dotted list of object keys and array indexes, such as "data.results" or "pages.0.items"; the
+    default "" is the top level value.  If the value at path is not an array it is yielded as the only item.
+    Only the item being parsed is held in memory.
+    """
+    stream = JSONStream(chunks)
+    for key in filter(None, path.split('.')):
+        if not stream.find(key):
+            return
+    if stream.peek() != '[':
+        yield stream.read_value()
+        return
+    stream.position += 1
+    if stream.peek() == ']':
+        return
+    while 1:
+        yield stream.read_value()
+        if stream.expect(',]') == ']':
+            return
+
+
 def ToXML(data):
-    """https://wiki.python.org/moin/MiniDom"""
-    dom = parseString(data)
-    return dom.toxml()
+    """Parse an XML document once and return its root Element."""
+    return ElementTree.fromstring(data)
+
+
+class ChunkReader(object):
+    """A file object reading from an iterator of chunks, for parsers that need read()."""
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = ""
+
+    def read(self, size=-1):
+        if size < 0:
+            data, self.buffer = self.buffer + "".join(self.chunks), ""
+            return data
+        while len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def tag_matches(tag, name):
+    return name == '*' or tag == name or tag.endswith('}' + name)
+
+
+def iter_xml_elements(chunks, path=""):
+    """Yield the elements matching path as they are parsed from chunks, freeing each one after it is used.
+
+    path is a tag such as "item", matched at any depth, or a "/" separated list of tags such as "channel/item"
+    that must end at the element; tags may omit their namespace and "*" matches any tag.  The default "" matches
+    the children of the root element.  A match inside another match is only yielded as part of the outer one.
+    Yielded elements are cleared when the iteration continues, so copy out what is needed first.
+    """
+    parts = filter(None, path.split('/'))
+    tags = []
+    elements = []
+    inside = 0
+    for event, element in ElementTree.iterparse(ChunkReader(chunks), events=('start', 'end')):
+        if event == 'start':
+            tags.append(element.tag)
+            if parts:
+                matched = len(tags) >= len(parts) and all(tag_matches(tag, name)
+                                                          for tag, name in zip(tags[-len(parts):], parts))
+            else:
+                matched = len(tags) == 2
+            # Matches nested in a match are yielded as part of the outer element.
+            elements.append((element, matched, matched and not inside))
+            inside += matched
+            continue
+        tags.pop()
+        element, matched, outermost = elements.pop()
+        inside -= matched
+        if outermost:
+            yield element
+            element.clear()
+            if elements:
+                elements[-1][0].remove(element)
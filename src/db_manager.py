@@ -1,11 +1,19 @@
+import Queue
+import atexit
+import itertools
 import sqlite3
 import os
 import abc
+import threading
+import time
+
+from settings import Defaults
 
 
 class DatabaseManager(object):
     location = None
     conn = None
+    journal_mode = None
 
     __metaclass__ = abc.ABCMeta
 
@@ -13,13 +21,18 @@ class DatabaseManager(object):
         pass
 
     def connect(self):
-        self.conn = sqlite3.connect(self.location)
+        self.conn = sqlite3.connect(self.location, check_same_thread=False)
+        if self.journal_mode:
+            self.conn.execute('PRAGMA journal_mode=%s;' % self.journal_mode)
 
     def disconnect(self):
         self.conn.close()
 
-    def execute(self, cmd):
-        return self.conn.execute(cmd)
+    def execute(self, cmd, parameters=()):
+        return self.conn.execute(cmd, parameters)
+
+    def executemany(self, cmd, rows):
+        return self.conn.executemany(cmd, rows)
 
     def commit(self):
         self.conn.commit()
@@ -36,40 +49,202 @@ class DatabaseManager(object):
 
 
 class ProxyDB(DatabaseManager):
+    """Quarantine of proxies that failed, kept on one long-lived WAL connection.
+
+    Each failure quarantines the socket for quarantine_base seconds, doubling with every further failure up to
+    quarantine_max, and prune_bad_proxies readmits it once that time has passed.  The failure count is forgotten one
+    failure per Defaults.proxy_failure_decay seconds after the quarantine ends, so a proxy that keeps failing keeps
+    its long backoff however often it works in between, and a recovered one is dropped from the table once its count
+    reaches zero.  Writes only update the in-memory copy and queue the row; a background writer commits the queue in
+    batches once batch_size entries are waiting or flush_interval seconds have passed, and everything left is
+    flushed on close/exit.  Pool sizes are recorded at most every Defaults.pool_size_interval seconds per protocol
+    and kept for Defaults.pool_size_retention seconds.
+    """
     location = "badproxies.sqlite"
     conn = None
-
-    def __init__(self):
+    journal_mode = 'WAL'
+    protocols = ('http', 'https')
+    statements = {
+        'quarantine': 'INSERT OR REPLACE INTO QUARANTINE (PROTOCOL, SOCKET, FAILURES, EXPIRES) VALUES (?, ?, ?, ?)',
+        'readmit': 'DELETE FROM QUARANTINE WHERE PROTOCOL = ? AND SOCKET = ?',
+        'pool_size': 'INSERT INTO POOL_SIZE (RECORDED, PROTOCOL, SIZE) VALUES (?, ?, ?)',
+        'pool_size_retention': 'DELETE FROM POOL_SIZE WHERE RECORDED < ?',
+    }
+
+    __shared = {}
+    __shared_lock = threading.Lock()
+
+    def __init__(self, batch_size=None, flush_interval=None):
         DatabaseManager.__init__(self)
         self.check_for_db()
+        self.connect()
+        self.migrate()
+        self.batch_size = batch_size or Defaults.proxy_db_batch_size
+        self.flush_interval = flush_interval or Defaults.proxy_db_flush_interval
+        self.__lock = threading.Lock()
+        self.__quarantine = None
+        self.__pool_size_recorded = {}
+        self.__queue = Queue.Queue()
+        self.__closed = False
+        self.__writer = threading.Thread(target=self.__write_behind, name="ProxyDB writer")
+        self.__writer.daemon = True
+        self.__writer.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def shared(cls):
+        """One ProxyDB per database file for the whole process."""
+        location = os.path.abspath(cls.location)
+        with cls.__shared_lock:
+            if location not in cls.__shared:
+                cls.__shared[location] = cls()
+            return cls.__shared[location]
 
     def create_db(self):
         self.connect()
-        self.execute('CREATE TABLE HTTPS (SOCKET TEXT PRIMARY KEY NOT NULL);')
-        self.execute('CREATE TABLE HTTP (SOCKET TEXT PRIMARY KEY NOT NULL);')
+        self.migrate()
         self.disconnect()
 
+    def migrate(self):
+        """Create missing tables and move entries from the old permanent HTTP/HTTPS blacklists into quarantine."""
+        self.execute('CREATE TABLE IF NOT EXISTS QUARANTINE (PROTOCOL TEXT NOT NULL, SOCKET TEXT NOT NULL, '
+                     'FAILURES INTEGER NOT NULL, EXPIRES REAL NOT NULL, PRIMARY KEY (PROTOCOL, SOCKET));')
+        self.execute('CREATE TABLE IF NOT EXISTS POOL_SIZE (RECORDED REAL NOT NULL, PROTOCOL TEXT NOT NULL, '
+                     'SIZE INTEGER NOT NULL);')
+        tables = set(row[0] for row in self.execute("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        for protocol in self.protocols:
+            if protocol.upper() in tables:
+                self.execute('INSERT OR IGNORE INTO QUARANTINE (PROTOCOL, SOCKET, FAILURES, EXPIRES) '
+                             'SELECT ?, SOCKET, 1, ? FROM %s' % protocol.upper(), (protocol, time.time()))
+                self.execute('DROP TABLE %s' % protocol.upper())
+        self.commit()
+
+    @staticmethod
+    def decayed_failures(failures, expires, now):
+        """The failure count left once the failures forgotten since the quarantine ended are taken off."""
+        return max(0, failures - int(max(0, now - expires) // Defaults.proxy_failure_decay))
+
     def prune_bad_proxies(self, socket_dict):
-        self.connect()
-        http_copied_list = list(socket_dict['http'])
-        https_copied_list = list(socket_dict['https'])
+        quarantine = self.__load_quarantine()
+        now = time.time()
+        pruned = dict(http=[], https=[])
         for protocol, proxies in socket_dict.iteritems():
-            for proxy in proxies:
-                cursor = self.execute('select socket from %s  where socket is "%s"' % (protocol.upper(), proxy))
-                for row in cursor:
-                    if protocol == 'http':
-                        http_copied_list.remove(row[0])
-                    else:
-                        https_copied_list.remove(row[0])
-        self.disconnect()
-        return dict(http=http_copied_list, https=https_copied_list)
-
-    def blacklist_socket(self, protocol, socket):
+            quarantined = quarantine.get(protocol, {})
+            pruned[protocol] = [proxy for proxy in proxies if quarantined.get(proxy, (0, 0))[1] <= now]
+        with self.__lock:
+            forgotten = [(protocol, socket) for protocol, sockets in quarantine.iteritems()
+                         for socket, (failures, expires) in sockets.iteritems()
+                         if not self.decayed_failures(failures, expires, now)]
+            for protocol, socket in forgotten:
+                del quarantine[protocol][socket]
+        for entry in forgotten:
+            self.__queue.put(('readmit', entry))
+        return pruned
+
+    def quarantine_socket(self, protocol, socket):
         if protocol and socket:
-            self.connect()
-            try:
-                self.execute("INSERT into %s (socket) VALUES (\"%s\")" % (protocol.upper(), socket))
-                self.commit()
-            except sqlite3.IntegrityError:
-                pass
+            if protocol not in self.protocols:
+                raise ValueError("Unknown protocol %s." % protocol)
+            quarantine = self.__load_quarantine()
+            with self.__lock:
+                now = time.time()
+                failures, expires = quarantine[protocol].get(socket, (0, 0))
+                failures = self.decayed_failures(failures, expires, now) + 1
+                backoff = min(Defaults.proxy_quarantine_base * 2 ** (failures - 1), Defaults.proxy_quarantine_max)
+                quarantine[protocol][socket] = (failures, now + backoff)
+            self.__queue.put(('quarantine', (protocol, socket) + quarantine[protocol][socket]))
+
+    blacklist_socket = quarantine_socket
+
+    def readmit_socket(self, protocol, socket):
+        """Clear the failure history of a socket at once, lifting its quarantine."""
+        quarantine = self.__load_quarantine()
+        with self.__lock:
+            if quarantine.get(protocol, {}).pop(socket, None) is None:
+                return
+        self.__queue.put(('readmit', (protocol, socket)))
+
+    def record_pool_size(self, protocol, size, force=False):
+        """Record the size of a pool, unless one was recorded for protocol within Defaults.pool_size_interval seconds
+        and force is not set."""
+        now = time.time()
+        with self.__lock:
+            if not force and now - self.__pool_size_recorded.get(protocol, 0) < Defaults.pool_size_interval:
+                return
+            self.__pool_size_recorded[protocol] = now
+        self.__queue.put(('pool_size', (now, protocol, size)))
+        self.__queue.put(('pool_size_retention', (now - Defaults.pool_size_retention,)))
+
+    def pool_size_history(self, protocol=None, since=0):
+        """List of (timestamp, protocol, size) rows recorded with record_pool_size, oldest first."""
+        self.flush()
+        query = 'SELECT RECORDED, PROTOCOL, SIZE FROM POOL_SIZE WHERE RECORDED >= ?'
+        parameters = (since,)
+        if protocol:
+            query += ' AND PROTOCOL = ?'
+            parameters += (protocol,)
+        with self.__lock:
+            return self.execute(query + ' ORDER BY RECORDED', parameters).fetchall()
+
+    def __load_quarantine(self):
+        """Read the quarantine table into memory once; later writes keep the copy current."""
+        with self.__lock:
+            if self.__quarantine is None:
+                self.__quarantine = dict((protocol, {}) for protocol in self.protocols)
+                for protocol, socket, failures, expires in self.execute('SELECT * FROM QUARANTINE'):
+                    self.__quarantine.setdefault(protocol, {})[socket] = (failures, expires)
+            return self.__quarantine
+
+    def flush(self):
+        """Block until every queued write is committed."""
+        if not self.__closed:
+            done = threading.Event()
+            self.__queue.put(('flush', done))
+            done.wait()
+
+    def close(self):
+        if not self.__closed:
+            self.__closed = True
+            self.__queue.put(('stop', None))
+            self.__writer.join()
             self.disconnect()
+
+    def __write_behind(self):
+        pending, waiting = [], []
+        deadline = None
+        while 1:
+            try:
+                if deadline is None:
+                    kind, payload = self.__queue.get()
+                else:
+                    kind, payload = self.__queue.get(timeout=max(0, deadline - time.time()))
+            except Queue.Empty:
+                kind, payload = 'timeout', None
+
+            if kind in self.statements:
+                pending.append((kind, payload))
+                if deadline is None:
+                    deadline = time.time() + self.flush_interval
+                if len(pending) < self.batch_size:
+                    continue
+            elif kind == 'flush':
+                waiting.append(payload)
+
+            try:
+                self.__commit(pending)
+            except sqlite3.Error:
+                pass  # Quarantine is advisory; losing a batch must not stop the writer.
+            pending, deadline = [], None
+            for event in waiting:
+                event.set()
+            waiting = []
+            if kind == 'stop':
+                return
+
+    def __commit(self, entries):
+        if not entries:
+            return
+        with self.__lock:
+            for kind, group in itertools.groupby(entries, key=lambda entry: entry[0]):
+                self.executemany(self.statements[kind], [payload for (_, payload) in group])
+            self.commit()
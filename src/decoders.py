@@ -0,0 +1,136 @@
+import zlib
+
+from requests.exceptions import ChunkedEncodingError, ConnectionError, ContentDecodingError
+from requests.packages.urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+
+from settings import Defaults
+
+
+class DecompressionBombError(Exception):
+    pass
+
+
+class DeflateDecoder(object):
+    """Inflates a "deflate" body, which servers send either zlib wrapped (as the RFC says) or raw."""
+    def __init__(self):
+        self.__decoder = zlib.decompressobj()
+        self.__first = True
+
+    def decompress(self, data, max_length):
+        if self.__first:
+            self.__first = False
+            try:
+                return self.__decoder.decompress(data, max_length)
+            except zlib.error:
+                self.__decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self.__decoder.decompress(data, max_length)
+
+    @property
+    def unconsumed_tail(self):
+        return self.__decoder.unconsumed_tail
+
+    def flush(self):
+        return self.__decoder.flush()
+
+
+class GzipDecoder(object):
+    """Inflates a "gzip" body, which may hold several gzip members one after the other (RFC 1952 section 2.2)."""
+    def __init__(self):
+        self.__decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.__tail = ""
+
+    def decompress(self, data, max_length):
+        output = self.__decoder.decompress(data, max_length)
+        self.__tail = self.__decoder.unconsumed_tail
+        # Input left over once a member has ended is the next member, or the zero padding some servers append.
+        following = self.__decoder.unused_data.lstrip("\0")
+        if following:
+            output += self.__decoder.flush()
+            self.__decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self.__tail = following
+        return output
+
+    @property
+    def unconsumed_tail(self):
+        return self.__tail
+
+    def flush(self):
+        return self.__decoder.flush()
+
+
+def decoder_for(encoding):
+    encoding = encoding.strip().lower()
+    if encoding in ('gzip', 'x-gzip'):
+        return GzipDecoder()
+    if encoding == 'deflate':
+        return DeflateDecoder()
+    return None
+
+
+def inflate(decoder, chunks, piece):
+    """Decompress chunks, never expanding more than piece bytes of output at a time."""
+    for data in chunks:
+        while data:
+            output = decoder.decompress(data, piece)
+            data = decoder.unconsumed_tail
+            if output:
+                yield output
+    tail = decoder.flush()
+    if tail:
+        yield tail
+
+
+def iter_decoded(response, chunk_size=None, max_size=None):
+    """Yield the body of a streamed requests.Response chunk by chunk, undoing its Content-Encoding.
+
+    Each chunk is decompressed as it arrives, and DecompressionBombError is raised as soon as a decompressed body
+    grows past max_size bytes (Defaults.max_decoded_size; 0 for no limit).  Bodies sent without a
+    Content-Encoding are not limited.  A response whose body has already been read, such as one served from the
+    response cache, is returned as it is.
+    """
+    chunk_size = chunk_size or Defaults.download_chunk_size
+    max_size = Defaults.max_decoded_size if max_size is None else max_size
+    encoded = False
+    if response._content is not False or response.raw is None:
+        chunks = [response.content or ""]
+    else:
+        chunks = response.raw.stream(chunk_size, decode_content=False)
+        # Codings are listed in the order they were applied, so they are undone last to first.
+        for encoding in reversed(response.headers.get('Content-Encoding', '').split(',')):
+            decoder = decoder_for(encoding)
+            if decoder is not None:
+                chunks = inflate(decoder, chunks, chunk_size)
+                encoded = True
+    if not encoded:
+        max_size = 0
+
+    size = 0
+    try:
+        for chunk in read_chunks(chunks):
+            size += len(chunk)
+            if max_size and size > max_size:
+                raise DecompressionBombError("The decoded response is larger than %d bytes." % max_size)
+            yield chunk
+    finally:
+        response.close()
+
+
+def read_chunks(chunks):
+    """Re-raise the urllib3 and zlib errors of reading a body as the requests exceptions iter_content raises."""
+    try:
+        for chunk in chunks:
+            yield chunk
+    except ProtocolError, e:
+        raise ChunkedEncodingError(e)
+    except (DecodeError, zlib.error), e:
+        raise ContentDecodingError(e)
+    except ReadTimeoutError, e:
+        raise ConnectionError(e)
+
+
+def read_decoded(response, max_size=None):
+    """The whole decoded body of response.  It is kept on the response, so response.content returns it as well."""
+    if response._content is False:
+        response._content = "".join(iter_decoded(response, max_size=max_size))
+        response._content_consumed = True
+    return response._content
@@ -0,0 +1,240 @@
+import re
+import threading
+from HTMLParser import HTMLParser
+
+
+class Selector(object):
+    """A CSS subset: descendant steps of tag, .class and #id (e.g. "div.product h2.name"), optionally ending in
+    @attribute to take an attribute instead of the text.  A bare "@attribute" reads the record element itself.
+    """
+    step_pattern = re.compile(r"^(\*|[\w-]+)?((?:[.#][\w-]+)*)$")
+
+    def __init__(self, selector):
+        self.selector = selector
+        path, _, self.attribute = selector.strip().partition('@')
+        self.attribute = self.attribute.strip().lower() or None
+        self.steps = []
+        for step in path.split():
+            match = self.step_pattern.match(step)
+            if not match:
+                raise ValueError("Unsupported selector step %r in %r." % (step, selector))
+            tag = match.group(1) if match.group(1) not in (None, '*') else None
+            ids = re.findall(r"#([\w-]+)", match.group(2))
+            classes = frozenset(re.findall(r"\.([\w-]+)", match.group(2)))
+            self.steps.append((tag and tag.lower(), ids[0] if ids else None, classes))
+        if not self.steps and not self.attribute:
+            raise ValueError("Empty selector.")
+
+    @staticmethod
+    def step_matches(step, element):
+        tag, element_id, classes = step
+        return (tag is None or tag == element[0]) and (element_id is None or element_id == element[1]) and \
+            classes <= element[2]
+
+    def matches(self, stack):
+        """Whether the last element of stack, a list of (tag, id, classes), is selected by the steps."""
+        steps = self.steps
+        if not steps or not stack or not self.step_matches(steps[-1], stack[-1]):
+            return False
+        index = len(stack) - 2
+        for step in reversed(steps[:-1]):
+            while index >= 0 and not self.step_matches(step, stack[index]):
+                index -= 1
+            if index < 0:
+                return False
+            index -= 1
+        return True
+
+    def xpath(self, relative=False):
+        conditions = []
+        for tag, element_id, classes in self.steps:
+            step = "descendant::%s" % (tag or '*')
+            if element_id:
+                step += "[@id='%s']" % element_id
+            for name in sorted(classes):
+                step += "[contains(concat(' ', normalize-space(@class), ' '), ' %s ')]" % name
+            conditions.append(step)
+        return ("." if relative else "") + "/" + "/".join(conditions)
+
+
+def normalize_text(text):
+    return u" ".join(text.split())
+
+
+class ExtractionParser(HTMLParser):
+    """Applies a Schema during a single HTMLParser pass, collecting one record per record element."""
+    void_tags = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'meta',
+                           'param', 'source', 'track', 'wbr'])
+    # Elements whose end tag may be left out, closed by the start of the tags listed for them.
+    implied_ends = {'li': ('li',), 'dt': ('dt', 'dd'), 'dd': ('dt', 'dd'), 'tr': ('tr', 'td', 'th'),
+                    'td': ('td', 'th'), 'th': ('td', 'th'), 'option': ('option',)}
+    paragraph_closers = frozenset(['address', 'article', 'aside', 'blockquote', 'div', 'dl', 'fieldset', 'footer',
+                                   'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'main', 'nav', 'ol',
+                                   'p', 'pre', 'section', 'table', 'ul'])
+    scopes = frozenset(['html', 'body', 'div', 'ul', 'ol', 'dl', 'table', 'select'])
+
+    def __init__(self, schema):
+        HTMLParser.__init__(self)
+        self.schema = schema
+        self.records = []
+        self.stack = []
+        self.record = None
+        self.record_depth = 0
+        self.captures = []  # [field name, depth, text pieces]
+        if schema.record is None:
+            self.start_record({})
+
+    def handle_starttag(self, tag, attrs):
+        self.close_implied(tag)
+        attrs = dict(attrs)
+        element = (tag, attrs.get('id'), frozenset((attrs.get('class') or '').split()))
+        self.stack.append(element)
+        if self.record is None:
+            if self.schema.record.matches(self.stack):
+                self.start_record(attrs)
+        else:
+            inner = self.stack[self.record_depth:]
+            for name, selector in self.schema.fields:
+                if self.record[name] is None and not any(capture[0] == name for capture in self.captures) \
+                        and selector.matches(inner):
+                    if selector.attribute:
+                        self.record[name] = attrs.get(selector.attribute)
+                    else:
+                        self.captures.append([name, len(self.stack), []])
+        if tag in self.void_tags:
+            self.pop_to(len(self.stack) - 1)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in self.void_tags:
+            self.pop_to(len(self.stack) - 1)
+
+    def handle_endtag(self, tag):
+        for depth in xrange(len(self.stack) - 1, -1, -1):
+            if self.stack[depth][0] == tag:
+                self.pop_to(depth)
+                return
+
+    def close_implied(self, tag):
+        closed = self.implied_ends.get(tag, ())
+        if tag in self.paragraph_closers:
+            closed += ('p',)
+        if not closed:
+            return
+        for depth in xrange(len(self.stack) - 1, -1, -1):
+            if self.stack[depth][0] in closed:
+                self.pop_to(depth)
+                return
+            if self.stack[depth][0] in self.scopes:
+                return
+
+    def handle_data(self, data):
+        for capture in self.captures:
+            capture[2].append(data)
+
+    def handle_entityref(self, name):
+        self.handle_data(self.unescape("&%s;" % name))
+
+    def handle_charref(self, name):
+        self.handle_data(self.unescape("&#%s;" % name))
+
+    def start_record(self, attrs):
+        self.record = dict((name, None) for name, selector in self.schema.fields)
+        self.record_depth = len(self.stack)
+        for name, selector in self.schema.fields:
+            if not selector.steps:
+                self.record[name] = attrs.get(selector.attribute)
+
+    def pop_to(self, depth):
+        """Close the elements from depth up, finishing their captures and the record they belong to."""
+        for capture in [capture for capture in self.captures if capture[1] > depth]:
+            self.record[capture[0]] = normalize_text(u"".join(capture[2]))
+            self.captures.remove(capture)
+        del self.stack[depth:]
+        if self.record is not None and self.schema.record is not None and depth < self.record_depth:
+            self.records.append(self.record)
+            self.record = None
+
+    def close(self):
+        HTMLParser.close(self)
+        self.pop_to(0)
+        if self.record is not None:
+            self.records.append(self.record)
+            self.record = None
+
+
+class Schema(object):
+    """Declarative extraction of records from HTML.
+
+    fields maps each output name to a Selector string, applied inside every element matched by the record
+    selector (or to the whole document when record is None, giving a single record).  Each field takes its first
+    match, as whitespace-normalized text or as the attribute named after "@", and is None when nothing matches.
+    The schema is compiled once; extract() then parses each document in a single pass, with lxml when it is
+    installed and the standard library HTMLParser otherwise.
+    """
+    def __init__(self, fields, record=None, backend=None):
+        self.record = Selector(record) if record else None
+        self.fields = [(name, Selector(selector)) for name, selector in sorted(fields.iteritems())]
+        self.backend = backend or ('lxml' if import_lxml(required=False) else 'html.parser')
+        if self.backend == 'lxml':
+            etree = import_lxml().etree
+            self.record_xpath = etree.XPath(self.record.xpath()) if self.record else None
+            self.field_xpaths = [(name, etree.XPath(selector.xpath(relative=True)) if selector.steps else None,
+                                  selector.attribute) for name, selector in self.fields]
+        elif self.backend != 'html.parser':
+            raise ValueError("Unknown HTML backend %r.  Use 'lxml' or 'html.parser'." % backend)
+
+    def extract(self, document, encoding='utf-8'):
+        """Return the list of records, as dicts, found in an HTML document given as bytes or unicode."""
+        if isinstance(document, str):
+            document = document.decode(encoding, 'replace')
+        if self.backend == 'lxml':
+            return self.extract_lxml(document)
+        parser = ExtractionParser(self)
+        parser.feed(document)
+        parser.close()
+        return parser.records
+
+    def extract_lxml(self, document):
+        root = import_lxml().html.document_fromstring(document) if document.strip() else None
+        if root is None:
+            return []
+        records = self.record_xpath(root) if self.record_xpath else [root]
+        results = []
+        for element in records:
+            record = {}
+            for name, xpath, attribute in self.field_xpaths:
+                found = xpath(element) if xpath else [element]
+                if not found:
+                    record[name] = None
+                elif attribute:
+                    record[name] = found[0].get(attribute)
+                else:
+                    record[name] = normalize_text(u"".join(found[0].itertext()))
+            results.append(record)
+        return results
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def compile_schema(fields, record=None, backend=None):
+    """The Schema for fields and record, compiled on first use and then shared."""
+    key = (tuple(sorted(fields.iteritems())), record, backend)
+    with _compiled_lock:
+        schema = _compiled.get(key)
+        if schema is None:
+            schema = _compiled[key] = Schema(fields, record, backend)
+        return schema
+
+
+def import_lxml(required=True):
+    try:
+        import lxml.etree
+        import lxml.html
+    except ImportError:
+        if not required:
+            return None
+        raise Exception("You need to install lxml to use the lxml HTML backend.  pip install simplewebscraper[html]")
+    return lxml
@@ -0,0 +1,267 @@
+import hashlib
+import math
+import os
+import re
+import string
+import struct
+import threading
+import time
+import urllib
+import urlparse
+
+from db_manager import DatabaseManager
+from settings import Defaults
+
+
+unreserved = frozenset(string.ascii_letters + string.digits + '-._~')
+percent_escape = re.compile(r'%([0-9A-Fa-f]{2})')
+stray_percent = re.compile(r'%(?![0-9A-Fa-f]{2})')
+non_ascii = re.compile(r'[\x80-\xff]')
+
+
+def normalize_escape(match):
+    """Decode an escaped unreserved character and uppercase any other escape.  Reserved characters such as %2F
+    stay escaped, since decoding them would change which resource the URL names."""
+    character = chr(int(match.group(1), 16))
+    if character in unreserved:
+        return character
+    return '%' + match.group(1).upper()
+
+
+def ascii_url(url):
+    """url as the ASCII string it is sent as, with any other bytes percent-escaped."""
+    if isinstance(url, unicode):
+        url = url.encode('utf-8')
+    return non_ascii.sub(lambda match: '%%%02X' % ord(match.group()), url.strip())
+
+
+def parameter_name(parameter):
+    return parameter.split('=', 1)[0]
+
+
+def canonicalize_url(url):
+    """Normalize a URL so that trivially different spellings of the same page dedupe to one entry.
+
+    Lowercases the scheme and host, drops default ports and the fragment, resolves "." and ".." path segments,
+    normalizes percent-escapes and sorts the query parameters by name.  Parameters are otherwise kept as written,
+    and repeated ones stay in their order, since servers may read ?a=1&a=0, ?a=0&a=1, ?q and ?q= differently.
+    """
+    if isinstance(url, unicode):
+        url = url.encode('utf-8')
+    scheme, netloc, path, query, fragment = urlparse.urlsplit(url.strip())
+    scheme = scheme.lower()
+    netloc = netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+
+    segments = []
+    for segment in path.split('/'):
+        if segment == '..':
+            if len(segments) > 1:
+                segments.pop()
+        elif segment != '.':
+            segments.append(segment)
+    if path.endswith(('/.', '/..')):
+        segments.append('')
+    path = urllib.quote(stray_percent.sub('%25', '/'.join(segments)), safe="/%:@!$&'()*+,;=-._~") or '/'
+    path = percent_escape.sub(normalize_escape, path)
+    if not path.startswith('/'):
+        path = '/' + path
+
+    parameters = [percent_escape.sub(normalize_escape, parameter) for parameter in query.split('&') if parameter]
+    query = '&'.join(sorted(parameters, key=parameter_name))
+    return urlparse.urlunsplit((scheme, netloc, path, query, ''))
+
+
+class BloomFilter(object):
+    """Fixed-size probabilistic set: no false negatives, false positives at about error_rate once capacity keys
+    have been added.  Uses capacity * -ln(error_rate) / ln(2)^2 bits, about 1.2 bytes per key at 1%.
+    """
+    header = struct.Struct('<QQQ')
+    page_size = 4096
+
+    def __init__(self, capacity=None, error_rate=None):
+        capacity = capacity or Defaults.frontier_capacity
+        error_rate = error_rate or Defaults.frontier_error_rate
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / float(capacity) * math.log(2))))
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+        self.saved_to = None
+        self.dirty = set()
+
+    def __positions(self, key):
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        first, second = struct.unpack('<QQ', hashlib.md5(key).digest())
+        return [(first + i * second) % self.size for i in xrange(self.hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.__positions(key))
+
+    def __len__(self):
+        return self.count
+
+    def add(self, key):
+        """Add key and return True if it was not (as far as the filter can tell) already present."""
+        added = False
+        for position in self.__positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                self.dirty.add((position >> 3) // self.page_size)
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def save(self, path):
+        """Write the filter to path.  When path already holds this filter only the pages changed since it was last
+        saved are rewritten; bits are only ever set, so a write cut short can lose recent keys but not corrupt it.
+        """
+        if self.saved_to == path and os.path.exists(path):
+            with open(path, 'r+b') as bloom_file:
+                for page in sorted(self.dirty):
+                    bloom_file.seek(self.header.size + page * self.page_size)
+                    bloom_file.write(self.bits[page * self.page_size:(page + 1) * self.page_size])
+                bloom_file.seek(0)
+                bloom_file.write(self.header.pack(self.size, self.hashes, self.count))
+        else:
+            temp_path = "%s.part" % path
+            with open(temp_path, 'wb') as bloom_file:
+                bloom_file.write(self.header.pack(self.size, self.hashes, self.count))
+                bloom_file.write(self.bits)
+            if os.name == 'nt' and os.path.exists(path):
+                os.remove(path)
+            os.rename(temp_path, path)
+            self.saved_to = path
+        self.dirty = set()
+
+    @classmethod
+    def load(cls, path):
+        bloom = cls.__new__(cls)
+        with open(path, 'rb') as bloom_file:
+            bloom.size, bloom.hashes, bloom.count = cls.header.unpack(bloom_file.read(cls.header.size))
+            bloom.bits = bytearray(bloom_file.read())
+        bloom.saved_to = path
+        bloom.dirty = set()
+        return bloom
+
+
+class Frontier(DatabaseManager):
+    """Persistent, priority ordered queue of URLs to crawl with a bounded-memory seen-set.
+
+    URLs are canonicalized and checked against a BloomFilter, so each URL is queued at most once however many times
+    it is pushed; rare false positives mean a small fraction of new URLs is skipped.  The canonical form is only the
+    key: pop() returns each URL as it was first pushed.  Only URLs waiting or being
+    fetched are kept in the sqlite table.  The queue is committed every checkpoint_every operations, and the changed
+    pages of the filter are saved at most every save_interval seconds and on close or checkpoint().  After a crash
+    the frontier resumes from the last commit with the URLs that were being fetched put back in the queue; URLs
+    finished since the filter was last saved may be crawled again.
+    """
+    location = "frontier.sqlite"
+    conn = None
+    journal_mode = 'WAL'
+    PENDING, IN_PROGRESS, FAILED = 0, 1, 2
+
+    def __init__(self, location=None, capacity=None, error_rate=None, checkpoint_every=None, save_interval=None):
+        DatabaseManager.__init__(self)
+        if location:
+            self.location = location
+        self.bloom_location = "%s.bloom" % self.location
+        self.checkpoint_every = checkpoint_every or Defaults.frontier_checkpoint_every
+        self.save_interval = Defaults.frontier_save_interval if save_interval is None else save_interval
+        self.__lock = threading.RLock()
+        self.__operations = 0
+        self.__saved = time.time()
+        self.check_for_db()
+        self.connect()
+        self.migrate()
+        self.execute('UPDATE FRONTIER SET STATE = ? WHERE STATE = ?', (self.PENDING, self.IN_PROGRESS))
+        self.commit()
+        if os.path.exists(self.bloom_location):
+            self.seen = BloomFilter.load(self.bloom_location)
+        else:
+            self.seen = BloomFilter(capacity, error_rate)
+        # The filter may have been saved before the last commit, so make sure it holds every queued URL.
+        for row in self.execute('SELECT URL FROM FRONTIER'):
+            self.seen.add(row[0])
+
+    def create_db(self):
+        self.connect()
+        self.execute('CREATE TABLE FRONTIER (URL TEXT PRIMARY KEY NOT NULL, PRIORITY INTEGER NOT NULL, '
+                     'STATE INTEGER NOT NULL, ADDED REAL NOT NULL, ORIGINAL TEXT);')
+        self.execute('CREATE INDEX FRONTIER_QUEUE ON FRONTIER (STATE, PRIORITY DESC, ADDED);')
+        self.commit()
+        self.disconnect()
+
+    def migrate(self):
+        """Add the ORIGINAL column to frontiers created before it existed; their URLs are fetched canonicalized."""
+        if 'ORIGINAL' not in set(row[1].upper() for row in self.execute('PRAGMA table_info(FRONTIER)')):
+            self.execute('ALTER TABLE FRONTIER ADD COLUMN ORIGINAL TEXT;')
+
+    def __len__(self):
+        with self.__lock:
+            return self.execute('SELECT COUNT(*) FROM FRONTIER WHERE STATE = ?', (self.PENDING,)).fetchone()[0]
+
+    def __contains__(self, url):
+        return canonicalize_url(url) in self.seen
+
+    def push(self, url, priority=0):
+        """Queue url unless it has been seen before.  Higher priorities are popped first.  Returns True if queued."""
+        original = ascii_url(url)
+        url = canonicalize_url(url)
+        with self.__lock:
+            if not self.seen.add(url):
+                return False
+            self.execute('INSERT OR IGNORE INTO FRONTIER (URL, PRIORITY, STATE, ADDED, ORIGINAL) '
+                         'VALUES (?, ?, ?, ?, ?)', (url, priority, self.PENDING, time.time(), original))
+            self.__operation()
+            return True
+
+    def pop(self, count=1):
+        """Claim up to count of the highest priority waiting URLs and return them as they were pushed."""
+        with self.__lock:
+            rows = self.execute('SELECT URL, ORIGINAL FROM FRONTIER WHERE STATE = ? '
+                                'ORDER BY PRIORITY DESC, ADDED LIMIT ?', (self.PENDING, count)).fetchall()
+            self.executemany('UPDATE FRONTIER SET STATE = ? WHERE URL = ?',
+                             [(self.IN_PROGRESS, url) for url, original in rows])
+            self.__operation()
+            return [original or url for url, original in rows]
+
+    def done(self, url):
+        with self.__lock:
+            self.execute('DELETE FROM FRONTIER WHERE URL = ?', (canonicalize_url(url),))
+            self.__operation()
+
+    def failed(self, url, requeue=False, priority=None):
+        """Record a URL that could not be fetched, putting it back in the queue if requeue is set."""
+        with self.__lock:
+            if priority is None:
+                self.execute('UPDATE FRONTIER SET STATE = ? WHERE URL = ?',
+                             (self.PENDING if requeue else self.FAILED, canonicalize_url(url)))
+            else:
+                self.execute('UPDATE FRONTIER SET STATE = ?, PRIORITY = ? WHERE URL = ?',
+                             (self.PENDING if requeue else self.FAILED, priority, canonicalize_url(url)))
+            self.__operation()
+
+    def checkpoint(self):
+        """Commit the queue and save the filter."""
+        with self.__lock:
+            self.commit()
+            self.seen.save(self.bloom_location)
+            self.__operations = 0
+            self.__saved = time.time()
+
+    def close(self):
+        self.checkpoint()
+        self.disconnect()
+
+    def __operation(self):
+        self.__operations += 1
+        if self.__operations >= self.checkpoint_every:
+            if time.time() - self.__saved >= self.save_interval:
+                self.checkpoint()
+            else:
+                self.commit()
+                self.__operations = 0
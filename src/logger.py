@@ -1,7 +1,12 @@
 # Source: https://bitbucket.org/richardpenman/webscraping/src/caea72b9331674b8295fc9b33f0bfaea04f6b28c/common.py
+import Queue
+import atexit
 import logging
 import logging.handlers
 import sys
+import threading
+
+from settings import Defaults
 
 
 class ConsoleHandler(logging.StreamHandler):
@@ -12,14 +17,88 @@ class ConsoleHandler(logging.StreamHandler):
         self.stream = None
 
     def emit(self, record):
-        if record.levelno >= logging.ERROR:
-            self.stream = sys.stderr
-        else:
-            self.stream = sys.stdout
-        logging.StreamHandler.emit(self, record)
+        # Pick the stream per record and write with StreamHandler, which handles unicode messages.  The handler's
+        # lock (an RLock, already held when called through handle) keeps other threads off self.stream meanwhile.
+        self.acquire()
+        try:
+            self.stream = sys.stderr if record.levelno >= logging.ERROR else sys.stdout
+            logging.StreamHandler.emit(self, record)
+        finally:
+            self.stream = None
+            self.release()
+
+
+class QueueHandler(logging.Handler):
+    """Hands records to a queue for a QueueListener to write (a backport of the Python 3 handler).
+
+    Unlike the Python 3 version the message is not formatted here, so the logging thread pays only for the put;
+    log immutable arguments.
+    """
+    def __init__(self, queue):
+        logging.Handler.__init__(self)
+        self.queue = queue
+
+    def prepare(self, record):
+        if record.exc_info:
+            # Tracebacks cannot wait: render them now and drop the frames.
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+class QueueListener(object):
+    """Background thread passing the records from a queue to handlers, each honouring its own level."""
+    sentinel = None
 
+    def __init__(self, queue, *handlers):
+        self.queue = queue
+        self.handlers = handlers
+        self.__thread = None
 
-def get_logger(output_file, level=logging.INFO, maxbytes=0):
+    def start(self):
+        self.__thread = threading.Thread(target=self.__monitor, name="QueueListener")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __monitor(self):
+        while 1:
+            record = self.queue.get()
+            if record is self.sentinel:
+                break
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+    def stop(self):
+        """Write the records still queued and stop the thread."""
+        if self.__thread is not None:
+            self.queue.put(self.sentinel)
+            self.__thread.join()
+            self.__thread = None
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps the per-request lines of only a rate fraction of requests, and every other record.
+
+    Per-request lines carry a request_id (passed in extra) and the choice depends on it alone, so a sampled
+    request keeps all of its lines.
+    """
+    def __init__(self, rate):
+        logging.Filter.__init__(self)
+        self.threshold = int(rate * 2 ** 32)
+
+    def filter(self, record):
+        request_id = getattr(record, 'request_id', None)
+        return request_id is None or (request_id * 2654435761) % 2 ** 32 < self.threshold
+
+
+def get_logger(output_file, level=logging.INFO, maxbytes=0, queued=False, sample_rate=None):
     """Create a logger instance
 
     output_file:
@@ -29,11 +108,16 @@ def get_logger(output_file, level=logging.INFO, maxbytes=0):
     maxbytes:
         the maxbytes allowed for the log file size. 0 means no limit.
         :param maxbytes:
+    queued:
+        write the file and console from a background thread, so logging calls only queue the record.
+    sample_rate:
+        fraction of requests whose per-request lines are kept (Defaults.log_sample_rate).
     """
     logger = logging.getLogger(output_file)
     # avoid duplicate handlers
     if not logger.handlers:
         logger.setLevel(logging.DEBUG)
+        handlers = []
         try:
             if not maxbytes:
                 file_handler = logging.FileHandler(output_file)
@@ -43,11 +127,25 @@ def get_logger(output_file, level=logging.INFO, maxbytes=0):
             pass # can not write file
         else:
             file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
-            logger.addHandler(file_handler)
+            handlers.append(file_handler)
 
         console_handler = ConsoleHandler()
         console_handler.setLevel(level)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
+
+        if queued:
+            log_queue = Queue.Queue()
+            listener = QueueListener(log_queue, *handlers)
+            listener.start()
+            atexit.register(listener.stop)
+            logger.addHandler(QueueHandler(log_queue))
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
+
+        sample_rate = Defaults.log_sample_rate if sample_rate is None else sample_rate
+        if sample_rate < 1:
+            logger.addFilter(SamplingFilter(sample_rate))
     return logger
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from settings import Defaults
+
+
+class Call(object):
+    """A call in progress whose result is shared with every thread waiting for the same key."""
+    def __init__(self):
+        self.__done = threading.Event()
+        self.value = None
+        self.exc_info = None
+
+    def finish(self, value=None, exc_info=None):
+        self.value = value
+        self.exc_info = exc_info
+        self.__done.set()
+
+    def wait(self):
+        self.__done.wait()
+        if self.exc_info:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.value
+
+
+class Memo(object):
+    """In-memory LRU cache of results that expire after ttl seconds, with concurrent calls coalesced.
+
+    While a key is being computed, other threads asking for it wait for that one call instead of repeating it, and
+    all of them receive the same object (or the same exception).  Failures are not cached.
+    """
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or Defaults.memo_max_entries
+        self.ttl = Defaults.memo_ttl if ttl is None else ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.__entries = OrderedDict()
+        self.__in_flight = {}
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get_or_call(self, key, function):
+        """Return the cached value for key, or the result of function() shared with concurrent callers."""
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is not None and entry[0] > time.time():
+                self.__entries[key] = entry
+                self.hits += 1
+                return entry[1]
+            call = self.__in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self.__in_flight[key] = Call()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.wait()
+
+        try:
+            value = function()
+        except BaseException:
+            with self.__lock:
+                del self.__in_flight[key]
+            call.finish(exc_info=sys.exc_info())
+            raise
+        with self.__lock:
+            del self.__in_flight[key]
+            self.__entries[key] = (time.time() + self.ttl, value)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+        call.finish(value)
+        return value
+
+    def invalidate(self, key):
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
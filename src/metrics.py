@@ -0,0 +1,194 @@
+import bisect
+import json
+import threading
+
+from settings import Defaults
+
+local = threading.local()
+
+
+def active_timings():
+    """The Timings of the request being sent on this thread, if any, for the connection classes to fill in."""
+    return getattr(local, 'timings', None)
+
+
+def set_active_timings(timings):
+    local.timings = timings
+
+
+class Timings(object):
+    """Seconds spent in each phase of one request attempt.  Phases a reused connection skips stay at 0."""
+    phases = ('dns', 'connect', 'tls', 'ttfb', 'transfer', 'convert')
+
+    def __init__(self):
+        self.durations = dict.fromkeys(self.phases, 0.0)
+
+    def __getitem__(self, phase):
+        return self.durations[phase]
+
+    def __repr__(self):
+        return "Timings(%s)" % ", ".join("%s=%.4f" % (phase, self.durations[phase]) for phase in self.phases)
+
+    def add(self, phase, seconds):
+        self.durations[phase] += seconds
+
+    def response_received(self, elapsed):
+        """Set time to first byte from requests' elapsed, which also covers setting up the connection."""
+        setup = self.durations['dns'] + self.durations['connect'] + self.durations['tls']
+        self.durations['ttfb'] = max(0.0, elapsed - setup)
+
+    @property
+    def total(self):
+        return sum(self.durations.itervalues())
+
+    def as_dict(self):
+        return dict(self.durations)
+
+
+def escape_label(value):
+    return unicode(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metric(object):
+    kind = None
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(labels.get(label, "") for label in self.labels)
+
+    def label_text(self, key, extra=()):
+        pairs = zip(self.labels, key) + list(extra)
+        if not pairs:
+            return ""
+        return "{%s}" % ",".join('%s="%s"' % (name, escape_label(value)) for name, value in pairs)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return sorted(self.values.items())
+
+    def prometheus(self):
+        return ["%s%s %s" % (self.name, self.label_text(key), value) for key, value in self.samples()]
+
+    def snapshot(self):
+        return [{'labels': dict(zip(self.labels, key)), 'value': value} for key, value in self.samples()]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels, buckets=None):
+        Metric.__init__(self, name, help_text, labels)
+        self.buckets = tuple(sorted(buckets or Defaults.metrics_buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        """(label values, cumulative bucket counts ending with +Inf, sum) for every label set."""
+        with self.lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self.values.iteritems()]
+        samples = []
+        for key, counts, total in sorted(values):
+            for index in xrange(1, len(counts)):
+                counts[index] += counts[index - 1]
+            samples.append((key, counts, total))
+        return samples
+
+    def prometheus(self):
+        lines = []
+        for key, counts, total in self.samples():
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                lines.append("%s_bucket%s %d" % (self.name, self.label_text(key, [('le', bound)]), count))
+            lines.append("%s_sum%s %r" % (self.name, self.label_text(key), total))
+            lines.append("%s_count%s %d" % (self.name, self.label_text(key), counts[-1]))
+        return lines
+
+    def snapshot(self):
+        return [{'labels': dict(zip(self.labels, key)),
+                 'buckets': [[bound, count] for bound, count in zip(self.buckets + ('+Inf',), counts)],
+                 'sum': total, 'count': counts[-1]} for key, counts, total in self.samples()]
+
+
+class MetricsRegistry(object):
+    """Named counters and histograms with labels, exported as Prometheus text or a JSON snapshot."""
+    def __init__(self):
+        self.__metrics = {}
+        self.__lock = threading.Lock()
+
+    def __register(self, metric_class, name, help_text, labels, *args):
+        with self.__lock:
+            metric = self.__metrics.get(name)
+            if metric is None:
+                metric = self.__metrics[name] = metric_class(name, help_text, labels, *args)
+            elif not isinstance(metric, metric_class):
+                raise ValueError("Metric %s is already registered as a %s." % (name, metric.kind))
+            return metric
+
+    def counter(self, name, help_text="", labels=()):
+        return self.__register(Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text="", labels=(), buckets=None):
+        return self.__register(Histogram, name, help_text, labels, buckets)
+
+    def __iter__(self):
+        with self.__lock:
+            return iter(sorted(self.__metrics.values(), key=lambda metric: metric.name))
+
+    def to_prometheus(self):
+        lines = []
+        for metric in self:
+            lines.append("# HELP %s %s" % (metric.name, metric.help))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            lines.extend(metric.prometheus())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return dict((metric.name, {'type': metric.kind, 'help': metric.help, 'samples': metric.snapshot()})
+                    for metric in self)
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), sort_keys=True)
+
+
+class RequestMetrics(object):
+    """The metrics Connect records for every request attempt.
+
+    Every label set is kept for the life of the registry, so the phase histograms, six per label set, leave out
+    the proxy: with a large rotating pool that label alone would multiply them by the pool size.
+    """
+    labels = ('host', 'proxy', 'method', 'outcome')
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.requests = registry.counter("scraper_requests_total", "Request attempts.", self.labels)
+        self.latency = registry.histogram("scraper_request_seconds", "Request attempt latency.", self.labels)
+        self.phases = registry.histogram("scraper_request_phase_seconds", "Time spent in each request phase.",
+                                         ('host', 'method', 'phase'))
+
+    def record(self, host, proxy, method, outcome, seconds, timings):
+        self.requests.inc(host=host, proxy=proxy, method=method, outcome=outcome)
+        self.latency.observe(seconds, host=host, proxy=proxy, method=method, outcome=outcome)
+        for phase in Timings.phases:
+            self.phases.observe(timings[phase], host=host, method=method, phase=phase)
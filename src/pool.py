@@ -0,0 +1,285 @@
+import abc
+import collections
+import random
+
+from settings import Defaults
+
+
+class ProxyEntry(object):
+    __slots__ = ('proxy', 'count', 'retired', 'position', 'latency', 'successes', 'failures', 'consecutive_failures',
+                 'in_flight')
+
+    def __init__(self, proxy, position=0):
+        self.proxy = proxy
+        self.count = 0
+        self.retired = False
+        self.position = position
+        self.latency = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+
+    def __repr__(self):
+        return "ProxyEntry(%r, count=%d)" % (self.proxy, self.count)
+
+    def record(self, latency=None):
+        """Record the outcome of one request; latency is None when the request failed."""
+        if latency is None:
+            self.failures += 1
+            self.consecutive_failures += 1
+        else:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += Defaults.proxy_latency_alpha * (latency - self.latency)
+
+    @property
+    def success_rate(self):
+        return (self.successes + 1.0) / (self.successes + self.failures + 2.0)
+
+    @property
+    def score(self):
+        """Expected successes per second of waiting; higher is better.  Unmeasured proxies get the benefit of the doubt."""
+        latency = Defaults.proxy_initial_latency if self.latency is None else self.latency
+        return self.success_rate / max(latency, 0.001)
+
+
+class ScoreTree(object):
+    """Segment tree over the positions of a pool's entry list.
+
+    Each node holds the sum of the scores below it, for weighted sampling, and the least
+    (in_flight, -score, position) key below it, for the least loaded proxy.  Updating a position and both queries
+    are O(log n).
+    """
+    empty = (float('inf'),)
+
+    def __init__(self, entries):
+        self.capacity = 1
+        while self.capacity < len(entries):
+            self.capacity *= 2
+        self.sums = [0.0] * (2 * self.capacity)
+        self.keys = [self.empty] * (2 * self.capacity)
+        for entry in entries:
+            score = entry.score
+            self.sums[self.capacity + entry.position] = score
+            self.keys[self.capacity + entry.position] = (entry.in_flight, -score, entry.position)
+        for node in xrange(self.capacity - 1, 0, -1):
+            self.sums[node] = self.sums[2 * node] + self.sums[2 * node + 1]
+            self.keys[node] = min(self.keys[2 * node], self.keys[2 * node + 1])
+
+    def set(self, position, score, key):
+        node = self.capacity + position
+        self.sums[node] = score
+        self.keys[node] = key
+        node //= 2
+        sums, keys = self.sums, self.keys
+        while node:
+            sums[node] = sums[2 * node] + sums[2 * node + 1]
+            left, right = keys[2 * node], keys[2 * node + 1]
+            keys[node] = left if left < right else right
+            node //= 2
+
+    def update(self, entry):
+        score = entry.score
+        self.set(entry.position, score, (entry.in_flight, -score, entry.position))
+
+    def clear(self, position):
+        self.set(position, 0.0, self.empty)
+
+    @property
+    def total(self):
+        return self.sums[1]
+
+    def sample(self, threshold):
+        """The position at which the running sum of scores passes threshold, a number in [0, total)."""
+        node = 1
+        sums = self.sums
+        while node < self.capacity:
+            node *= 2
+            if threshold >= sums[node] and sums[node + 1] > 0:
+                threshold -= sums[node]
+                node += 1
+        return node - self.capacity
+
+    def least(self):
+        """The position of the entry with the fewest requests in flight, the best score breaking ties."""
+        return self.keys[1][2]
+
+
+class IndexedProxyPool(object):
+    """The proxies of one protocol, in rotation order.
+
+    Entries sit in a deque for rotation, in a list for random access and in a dict keyed by proxy for lookup.
+    Removing an entry swaps it out of the list, drops it from the dict and marks it retired; retired entries are
+    skipped when they reach the head of the deque and it is compacted once they make up half of it, so lookup,
+    rotation, sampling, use counting and expiry are all O(1) amortised.  A ScoreTree for score weighted and least
+    in flight picks is built the first time one is asked for and kept current from then on, at O(log n) per change.
+    Scores and in-flight counts must therefore be changed through record() and release(), not on the entries.
+    """
+    __slots__ = ('__order', '__entries', '__index', '__retired', '__tree')
+
+    def __init__(self, proxies=()):
+        self.__order = collections.deque()
+        self.__entries = []
+        self.__index = {}
+        self.__retired = 0
+        self.__tree = None
+        for proxy in proxies:
+            self.add(proxy)
+
+    def __len__(self):
+        return len(self.__index)
+
+    def __contains__(self, proxy):
+        return proxy in self.__index
+
+    def __iter__(self):
+        return (entry.proxy for entry in list(self.__order) if not entry.retired)
+
+    def __repr__(self):
+        return "IndexedProxyPool(%r)" % list(self)
+
+    @property
+    def entries(self):
+        """The live entries in no particular order.  Do not modify."""
+        return self.__entries
+
+    def add(self, proxy, latency=None):
+        entry = self.__index.get(proxy)
+        if entry is None:
+            entry = self.__index[proxy] = ProxyEntry(proxy, len(self.__entries))
+            entry.latency = latency
+            self.__entries.append(entry)
+            self.__order.append(entry)
+            if self.__tree is not None:
+                if entry.position < self.__tree.capacity:
+                    self.__tree.update(entry)
+                else:
+                    self.__tree = None  # Rebuilt at twice the size when next needed
+        return entry
+
+    def get(self, proxy):
+        return self.__index.get(proxy)
+
+    def remove(self, proxy):
+        entry = self.__index.pop(proxy, None)
+        if entry is not None:
+            last = self.__entries.pop()
+            if self.__tree is not None:
+                self.__tree.clear(last.position)
+            if last is not entry:
+                self.__entries[entry.position] = last
+                last.position = entry.position
+                if self.__tree is not None:
+                    self.__tree.update(last)
+            entry.retired = True
+            self.__retired += 1
+            if self.__retired * 2 > len(self.__order):
+                self.__order = collections.deque(live for live in self.__order if not live.retired)
+                self.__retired = 0
+        return entry
+
+    def head(self):
+        while self.__order and self.__order[0].retired:
+            self.__order.popleft()
+            self.__retired -= 1
+        if self.__order:
+            return self.__order[0]
+        return None
+
+    def demote(self, proxy):
+        """Move proxy to the back of the rotation if it is at the head, so RoundRobin tries the next proxy first."""
+        entry = self.head()
+        if entry is not None and entry.proxy == proxy:
+            self.__order.rotate(-1)
+
+    def random_entry(self):
+        return random.choice(self.__entries)
+
+    def __score_tree(self):
+        if self.__tree is None:
+            self.__tree = ScoreTree(self.__entries)
+        return self.__tree
+
+    def weighted_entry(self):
+        """A random live entry, drawn with probability proportional to its score."""
+        tree = self.__score_tree()
+        position = tree.sample(random.uniform(0, tree.total))
+        return self.__entries[min(position, len(self.__entries) - 1)]
+
+    def least_in_flight_entry(self):
+        return self.__entries[self.__score_tree().least()]
+
+    def record(self, proxy, latency=None):
+        """Record the outcome of a request through proxy; latency is None when it failed."""
+        entry = self.__index.get(proxy)
+        if entry is not None:
+            entry.record(latency)
+            if self.__tree is not None:
+                self.__tree.update(entry)
+        return entry
+
+    def release(self, proxy):
+        """Mark one request through proxy as no longer in flight."""
+        entry = self.__index.get(proxy)
+        if entry is not None:
+            entry.in_flight -= 1
+            if self.__tree is not None:
+                self.__tree.update(entry)
+        return entry
+
+    def acquire(self, use_limit, strategy=None):
+        """Pick the next proxy with strategy and count one use of it, retiring picks that already reached use_limit.
+
+        Returns None when the pool is empty.
+        """
+        strategy = strategy or RoundRobin()
+        while self.__entries:
+            entry = strategy.select(self)
+            if entry.count < use_limit:
+                entry.count += 1
+                entry.in_flight += 1
+                if self.__tree is not None:
+                    self.__tree.update(entry)
+                return entry.proxy
+            self.remove(entry.proxy)
+        return None
+
+
+class SelectionStrategy(object):
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def select(self, pool):
+        """Return the ProxyEntry to use next from a non-empty IndexedProxyPool."""
+        pass
+
+
+class RoundRobin(SelectionStrategy):
+    """Use the proxy at the head of the pool until it reaches use_per_proxy_count, then move on."""
+    def select(self, pool):
+        return pool.head()
+
+
+class WeightedRandom(SelectionStrategy):
+    """Pick at random, weighted by ProxyEntry.score.  O(log n) per pick."""
+    def select(self, pool):
+        return pool.weighted_entry()
+
+
+class PowerOfTwoChoices(SelectionStrategy):
+    """Sample two proxies at random and keep the better scoring one.  O(1) per pick."""
+    def select(self, pool):
+        first, second = pool.random_entry(), pool.random_entry()
+        if second.score > first.score:
+            return second
+        return first
+
+
+class LeastInFlight(SelectionStrategy):
+    """Pick the proxy with the fewest requests in flight, preferring the better score on ties.  O(log n) per pick."""
+    def select(self, pool):
+        return pool.least_in_flight_entry()
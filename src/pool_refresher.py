@@ -0,0 +1,75 @@
+import threading
+import time
+
+from proxy_aggregators import aggregator_instance
+from settings import Defaults
+
+
+class PoolRefresher(object):
+    """Keep a Connect's proxy pool topped up from an aggregator on a background thread.
+
+    Every check_interval seconds the pool sizes are compared against low_water_mark.  When any protocol the
+    aggregator supplied last time has fallen below it (and min_interval seconds have passed since the last refresh),
+    or interval seconds have passed, the aggregator is run again.  Proxies already in the live pool are dropped from
+    its list, so a validator only probes the new ones, and the rest are merged into the live pool.  Requests keep
+    using the current pool while the aggregator runs.
+    """
+    def __init__(self, connection, aggregator, low_water_mark=None, interval=None, check_interval=None,
+                 min_interval=None):
+        self.connection = connection
+        self.aggregator = aggregator_instance(aggregator)
+        self.name = type(self.aggregator).__name__
+        self.low_water_mark = Defaults.proxy_low_water_mark if low_water_mark is None else low_water_mark
+        self.interval = interval or Defaults.proxy_refresh_interval
+        self.check_interval = check_interval or Defaults.proxy_refresh_check
+        self.min_interval = Defaults.proxy_refresh_min_interval if min_interval is None else min_interval
+        self.last_refresh = None
+        self.supplied = ()
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    @property
+    def running(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self.__stop.clear()
+            self.__thread = threading.Thread(target=self.__run, name="PoolRefresher %s" % self.name)
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        if self.running and self.__thread is not threading.current_thread():
+            self.__thread.join()
+
+    def needs_refresh(self):
+        if self.last_refresh is None or time.time() - self.last_refresh >= self.interval:
+            return True
+        if time.time() - self.last_refresh < self.min_interval:
+            return False
+        pool = self.connection.proxy_pool
+        return any(len(pool.get(protocol, ())) < self.low_water_mark for protocol in self.supplied)
+
+    def refresh(self):
+        self.connection.logger.info("Refreshing ProxyPool from %s.", self.name)
+        generated = self.aggregator.generate_pool()
+        self.supplied = [protocol for protocol, proxies in generated.iteritems() if proxies]
+        live = self.connection.proxy_pool
+        new = dict((protocol, [proxy for proxy in proxies if proxy not in live.get(protocol, ())])
+                   for protocol, proxies in generated.iteritems())
+        added = self.connection.merge_pool(self.connection.build_pool(new))
+        self.last_refresh = time.time()
+        self.connection.logger.info("ProxyPool refreshed with %d new proxies.", added)
+        return added
+
+    def __run(self):
+        while not self.__stop.is_set():
+            if self.needs_refresh():
+                try:
+                    self.refresh()
+                except Exception:
+                    self.connection.logger.exception("ProxyPool refresh from %s failed.", self.name)
+                    self.last_refresh = time.time()
+            self.__stop.wait(self.check_interval)
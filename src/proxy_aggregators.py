@@ -1,16 +1,175 @@
+import abc
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from multiprocessing.pool import ThreadPool
+
 from db_manager import ProxyDB
 from enumerations import HTTPMethods
+from settings import Defaults
 
 
-class ProxyPool(type):
+class ProxyPool(abc.ABCMeta):
     def __init__(cls, name, bases, d):
-        type.__init__(cls, name, bases, d)
+        abc.ABCMeta.__init__(cls, name, bases, d)
         cls._proxy_pool = dict()
 
 
-class Hidester(object):
+def aggregator_instance(aggregator):
+    """Aggregators may be given as a class (ProxyPool.Hidester) or as a configured instance."""
+    if isinstance(aggregator, ProxyPool):
+        return aggregator()
+    return aggregator
+
+
+def normalize(proxies, default_scheme="http"):
+    """Turn proxies from any source into a deduplicated {"http": [...], "https": [...]} pool.
+
+    Entries may be "scheme://host:port" strings, bare "host:port" strings or (scheme, host, port) tuples.
+    Anything else is dropped.
+    """
+    pool = dict(http=[], https=[])
+    seen = set()
+    for proxy in proxies:
+        if isinstance(proxy, (tuple, list)):
+            proxy = "%s://%s:%s" % tuple(proxy)
+        proxy = proxy.strip()
+        if "://" not in proxy:
+            proxy = "%s://%s" % (default_scheme, proxy)
+        match = re.match(r"^(https?)://([^/:\s]+):(\d+)/?$", proxy, re.IGNORECASE)
+        if not match:
+            continue
+        scheme = match.group(1).lower()
+        proxy = "%s://%s:%s" % (scheme, match.group(2).lower(), match.group(3))
+        if proxy not in seen:
+            seen.add(proxy)
+            pool[scheme].append(proxy)
+    return pool
+
+
+class ProxyListCache(object):
+    """Fetched proxy lists stored as JSON files in Defaults.proxy_cache_path, valid for ttl seconds."""
+    def __init__(self, path=None):
+        self.path = path or Defaults.proxy_cache_path
+
+    def filename(self, key):
+        return os.path.join(self.path, "%s.json" % re.sub(r"[^\w.-]", "_", key))
+
+    def get(self, key, ttl):
+        try:
+            with open(self.filename(key)) as cache_file:
+                cached = json.load(cache_file)
+        except (IOError, ValueError):
+            return None
+        if time.time() - cached.get('fetched', 0) > ttl:
+            return None
+        return cached.get('proxies')
+
+    def put(self, key, proxies):
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                if not os.path.isdir(self.path):
+                    raise
+        filename = self.filename(key)
+        temp_filename = "%s.%s.part" % (filename, uuid.uuid4().hex)
+        with open(temp_filename, 'w') as cache_file:
+            json.dump({'fetched': time.time(), 'proxies': list(proxies)}, cache_file)
+        if os.name == 'nt' and os.path.exists(filename):
+            os.remove(filename)
+        os.rename(temp_filename, filename)
+
+
+class Aggregator(object):
+    """A source of proxies.  Subclasses implement fetch(); generate_pool() adds caching, normalization and pruning."""
     __metaclass__ = ProxyPool
+    cache_ttl = None
+
+    @abc.abstractmethod
+    def fetch(self):
+        """Return an iterable of proxies in any format accepted by normalize()."""
+        pass
+
+    @property
+    def cache_key(self):
+        return type(self).__name__
+
+    def fetch_cached(self):
+        ttl = Defaults.proxy_cache_ttl if self.cache_ttl is None else self.cache_ttl
+        cache = ProxyListCache()
+        proxies = cache.get(self.cache_key, ttl) if ttl else None
+        if proxies is None:
+            proxies = [proxy if isinstance(proxy, basestring) else "%s://%s:%s" % tuple(proxy)
+                       for proxy in self.fetch()]
+            if ttl:
+                cache.put(self.cache_key, proxies)
+        return proxies
+
+    def generate_pool(self):
+        return ProxyDB.shared().prune_bad_proxies(normalize(self.fetch_cached()))
+
 
+class MultiSource(Aggregator):
+    """Several aggregators fetched concurrently and merged into one deduplicated pool.
+
+    Each source is cached on its own.  A source that fails is skipped unless every source fails.
+    """
+    def __init__(self, *sources):
+        self.sources = [aggregator_instance(source) for source in sources]
+        if not self.sources:
+            raise ValueError("Please supply at least one proxy source.")
+
+    @staticmethod
+    def fetch_source(source):
+        try:
+            return source.fetch_cached(), None
+        except Exception as exc:
+            return [], exc
+
+    def fetch(self):
+        pool = ThreadPool(len(self.sources))
+        try:
+            results = pool.map(self.fetch_source, self.sources)
+        finally:
+            pool.close()
+        errors = [error for (proxies, error) in results if error is not None]
+        if len(errors) == len(self.sources):
+            raise errors[0]
+        return [proxy for (proxies, error) in results for proxy in proxies]
+
+    def fetch_cached(self):
+        return self.fetch()
+
+
+class ProxyListURL(Aggregator):
+    """A plain text proxy list, one "host:port" or "scheme://host:port" per line, served at url."""
+    def __init__(self, url, default_scheme="http"):
+        from connection import Connect
+
+        self.url = url
+        self.default_scheme = default_scheme
+        self.scraper = Connect()
+
+    @property
+    def cache_key(self):
+        return "ProxyListURL-%s" % hashlib.md5(self.url).hexdigest()
+
+    def fetch(self):
+        self.scraper.url = self.url
+        self.scraper.HTTP_mode = HTTPMethods.GET
+        proxies = []
+        for line in (self.scraper.fetch() or "").splitlines():
+            line = line.split('#')[0].strip()
+            if line:
+                proxies.append(line if "://" in line else "%s://%s" % (self.default_scheme, line))
+        return proxies
+
+
+class Hidester(Aggregator):
     def __init__(self):
         from connection import Connect
 
@@ -33,10 +192,5 @@ class Hidester(object):
         self.scraper.HTTP_mode = HTTPMethods.GET
         return ToJSON(self.scraper.fetch())
 
-    def generate_pool(self):
-        proxies = self.get_proxy_json()
-        proxy_pool = dict(https=[], http=[])
-        for proxy in proxies:
-            proxy_pool[proxy['type']].append("%s://%s:%s" % (proxy['type'], proxy['IP'], proxy['PORT']))
-
-        return ProxyDB().prune_bad_proxies(proxy_pool)
+    def fetch(self):
+        return [(proxy['type'], proxy['IP'], proxy['PORT']) for proxy in self.get_proxy_json()]
@@ -0,0 +1,55 @@
+import time
+from multiprocessing.pool import ThreadPool
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from settings import Defaults
+
+
+class ProxyValidator(object):
+    """Probe candidate proxies concurrently against check_url and keep the ones that answer in time.
+
+    validate() takes a pool dictionary in the same format as Connect.proxy_pool and returns, per protocol, a list
+    of (proxy, latency) pairs for the responsive proxies ordered fastest first, plus a list of (protocol, proxy)
+    pairs that failed the probe.
+    """
+    def __init__(self, check_url=None, timeout=None, max_workers=None):
+        self.check_url = check_url or Defaults.proxy_check_url
+        self.timeout = timeout or Defaults.proxy_check_timeout
+        self.max_workers = max_workers or Defaults.proxy_check_workers
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=self.max_workers))
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=self.max_workers))
+
+    def probe(self, candidate):
+        protocol, proxy = candidate
+        start = time.time()
+        try:
+            response = self.session.get(self.check_url, proxies={'http': proxy, 'https': proxy},
+                                        timeout=self.timeout, verify=False, stream=True)
+            response.close()
+        except requests.exceptions.RequestException:
+            return protocol, proxy, None
+        if response.status_code >= 400:
+            return protocol, proxy, None
+        return protocol, proxy, time.time() - start
+
+    def validate(self, socket_dict):
+        candidates = [(protocol, proxy) for protocol, proxies in socket_dict.iteritems() for proxy in proxies]
+        responsive = dict((protocol, []) for protocol in socket_dict)
+        failed = []
+        if not candidates:
+            return responsive, failed
+        pool = ThreadPool(max(1, min(self.max_workers, len(candidates))))
+        try:
+            for protocol, proxy, latency in pool.imap_unordered(self.probe, candidates):
+                if latency is None:
+                    failed.append((protocol, proxy))
+                else:
+                    responsive[protocol].append((proxy, latency))
+        finally:
+            pool.close()
+        for proxies in responsive.itervalues():
+            proxies.sort(key=lambda pair: pair[1])
+        return responsive, failed
@@ -0,0 +1,50 @@
+from collections import namedtuple
+
+from enumerations import HTTPMethods
+
+
+def freeze(mapping):
+    if mapping is None:
+        return ()
+    if not isinstance(mapping, dict):
+        raise TypeError
+    return tuple(sorted(mapping.items()))
+
+
+class Request(namedtuple('Request', ['url', 'HTTP_mode', 'parameters', 'headers'])):
+    """Immutable description of a single fetch.
+
+    parameters and headers are stored as sorted tuples of (key, value) pairs so a Request can be shared
+    between threads and used as a dictionary key.  Headers given here are merged over the session headers.
+    """
+    __slots__ = ()
+
+    def __new__(cls, url, HTTP_mode=HTTPMethods.GET, parameters=None, headers=None):
+        if not url:
+            raise Exception("Please supply a URL to fetch.")
+        if HTTP_mode not in (HTTPMethods.GET, HTTPMethods.POST):
+            raise KeyError("Please enter a valid HTTP method.  GET or POST.")
+        return super(Request, cls).__new__(cls, url, HTTP_mode, freeze(parameters), freeze(headers))
+
+    @property
+    def parameter_dict(self):
+        return dict(self.parameters)
+
+    @property
+    def header_dict(self):
+        return dict(self.headers)
+
+
+class Result(namedtuple('Result', ['request', 'content', 'response_headers', 'error', 'timings'])):
+    """Outcome of one Request run by Connect.fetch_many.  Exactly one of content/error is meaningful.
+
+    timings holds the phase Timings of the last attempt, or None if no attempt was made.
+    """
+    __slots__ = ()
+
+    def __new__(cls, request, content, response_headers, error, timings=None):
+        return super(Result, cls).__new__(cls, request, content, response_headers, error, timings)
+
+    @property
+    def ok(self):
+        return self.error is None
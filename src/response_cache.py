@@ -0,0 +1,137 @@
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from db_manager import DatabaseManager
+from settings import Defaults
+
+
+class ResponseCache(DatabaseManager):
+    """On-disk cache of GET responses that can be revalidated with ETag / Last-Modified.
+
+    Responses carrying an ETag or Last-Modified header are stored with their decoded body.  On a revisit the request
+    is sent with If-None-Match / If-Modified-Since and a 304 answer is served from the cache.  Once the stored bodies
+    exceed max_size bytes the least recently used entries are evicted.  A hit only marks its entry as used once the
+    stored access time is touch_interval seconds old, and those marks are written in one batch per touch_interval
+    or with the next put, so hits do not each cost a write.
+    """
+    location = "responses.sqlite"
+    conn = None
+    journal_mode = 'WAL'
+    skipped_headers = ('content-encoding', 'content-length', 'transfer-encoding')
+
+    def __init__(self, location=None, max_size=None, touch_interval=None):
+        DatabaseManager.__init__(self)
+        if location:
+            self.location = location
+        self.max_size = max_size or Defaults.response_cache_size
+        self.touch_interval = Defaults.response_cache_touch_interval if touch_interval is None else touch_interval
+        self.__lock = threading.Lock()
+        self.__touched = {}
+        self.__touches_written = time.time()
+        self.check_for_db()
+        self.connect()
+        self.size = self.execute('SELECT COALESCE(SUM(SIZE), 0) FROM RESPONSES').fetchone()[0]
+
+    def create_db(self):
+        self.connect()
+        self.execute('CREATE TABLE RESPONSES (KEY TEXT PRIMARY KEY NOT NULL, URL TEXT NOT NULL, HEADERS TEXT NOT NULL, '
+                     'BODY BLOB NOT NULL, SIZE INTEGER NOT NULL, ETAG TEXT, LAST_MODIFIED TEXT, ACCESSED REAL NOT NULL);')
+        self.execute('CREATE INDEX RESPONSES_ACCESSED ON RESPONSES (ACCESSED);')
+        self.commit()
+        self.disconnect()
+
+    @staticmethod
+    def key(method, request):
+        return hashlib.sha1(repr((method, request.url, request.parameters))).hexdigest()
+
+    @staticmethod
+    def is_cacheable(response):
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        return response.status_code == 200 and 'no-store' not in cache_control and \
+            ('ETag' in response.headers or 'Last-Modified' in response.headers)
+
+    def get(self, key):
+        """The stored (headers, body, etag, last_modified) for key, or None."""
+        with self.__lock:
+            row = self.execute('SELECT HEADERS, BODY, ETAG, LAST_MODIFIED, ACCESSED FROM RESPONSES WHERE KEY = ?',
+                               (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[4] >= self.touch_interval:
+                self.__touched[key] = now
+            if self.__touched and now - self.__touches_written >= self.touch_interval:
+                self.__write_touches()
+                self.commit()
+        return json.loads(row[0]), str(row[1]), row[2], row[3]
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry[2]:
+            headers['If-None-Match'] = entry[2]
+        if entry[3]:
+            headers['If-Modified-Since'] = entry[3]
+        return headers
+
+    def put(self, key, url, response):
+        """Store a response whose body has been read."""
+        body = response.content
+        headers = dict((name, value) for name, value in response.headers.iteritems()
+                       if name.lower() not in self.skipped_headers)
+        if len(body) > self.max_size:
+            return
+        with self.__lock:
+            self.__touched.pop(key, None)
+            old = self.execute('SELECT SIZE FROM RESPONSES WHERE KEY = ?', (key,)).fetchone()
+            self.execute('INSERT OR REPLACE INTO RESPONSES (KEY, URL, HEADERS, BODY, SIZE, ETAG, LAST_MODIFIED, ACCESSED) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (key, url, json.dumps(headers), sqlite3.Binary(body), len(body),
+                          response.headers.get('ETag'), response.headers.get('Last-Modified'), time.time()))
+            self.size += len(body) - (old[0] if old else 0)
+            self.__write_touches()
+            self.__evict()
+            self.commit()
+
+    def as_response(self, entry, url):
+        """Rebuild a fully read requests.Response from a cache entry."""
+        response = requests.Response()
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict(entry[0])
+        response._content = entry[1]
+        response._content_consumed = True
+        response.url = url
+        response.elapsed = datetime.timedelta(0)
+        return response
+
+    def __write_touches(self):
+        """Write the access times of recent hits; the caller commits."""
+        if self.__touched:
+            self.executemany('UPDATE RESPONSES SET ACCESSED = ? WHERE KEY = ?',
+                             [(accessed, key) for key, accessed in self.__touched.iteritems()])
+            self.__touched = {}
+        self.__touches_written = time.time()
+
+    def __evict(self):
+        while self.size > self.max_size:
+            rows = self.execute('SELECT KEY, SIZE FROM RESPONSES ORDER BY ACCESSED LIMIT 100').fetchall()
+            if not rows:
+                self.size = 0
+                return
+            for key, size in rows:
+                if self.size <= self.max_size:
+                    break
+                self.execute('DELETE FROM RESPONSES WHERE KEY = ?', (key,))
+                self.size -= size
+
+    def close(self):
+        with self.__lock:
+            self.__write_touches()
+            self.commit()
+        self.disconnect()
@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+
+import requests
+
+from settings import Defaults
+
+
+class RetryBudget(object):
+    """Retries shared by every request of a Connect.
+
+    A token bucket: each first attempt deposits ratio tokens, tokens also trickle in at min_per_second, and each
+    retry spends one.  During a bad network period retries are capped at a fraction of the real traffic instead of
+    multiplying it.
+    """
+    def __init__(self, ratio=None, min_per_second=None):
+        self.ratio = Defaults.retry_budget_ratio if ratio is None else ratio
+        self.min_per_second = Defaults.retry_budget_min_per_second if min_per_second is None else min_per_second
+        self.capacity = max(self.min_per_second * 10, 1)
+        self.__tokens = self.capacity
+        self.__updated = time.time()
+        self.__lock = threading.Lock()
+
+    def __refill(self):
+        now = time.time()
+        self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.min_per_second)
+        self.__updated = now
+
+    def deposit(self):
+        with self.__lock:
+            self.__refill()
+            self.__tokens = min(self.capacity, self.__tokens + self.ratio)
+
+    def withdraw(self):
+        with self.__lock:
+            self.__refill()
+            if self.__tokens < 1:
+                return False
+            self.__tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """How Get and Post retry a request.
+
+    max_attempts:
+        attempts per request including the first, 0 for no limit.
+    backoff_base, backoff_max, jitter:
+        the wait before retry n is backoff_base * 2 ** (n - 1) capped at backoff_max, drawn uniformly from
+        [0, that] when jitter is set.  No wait is needed after a proxy failure since the next attempt uses
+        another proxy.
+    deadline:
+        seconds after which a request stops retrying, None for no limit.
+    budget:
+        a RetryBudget shared between requests, False to disable.
+    exceptions, statuses:
+        the exceptions and HTTP status codes that are retried.
+    """
+    def __init__(self, max_attempts=None, backoff_base=None, backoff_max=None, jitter=True, deadline=None,
+                 budget=None, exceptions=None, statuses=None):
+        self.max_attempts = Defaults.retry_max_attempts if max_attempts is None else max_attempts
+        self.backoff_base = Defaults.retry_backoff_base if backoff_base is None else backoff_base
+        self.backoff_max = Defaults.retry_backoff_max if backoff_max is None else backoff_max
+        self.jitter = jitter
+        self.deadline = Defaults.retry_deadline if deadline is None else deadline
+        self.budget = RetryBudget() if budget is None else budget
+        self.exceptions = tuple(exceptions or (requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout,
+                                               requests.exceptions.TooManyRedirects, requests.exceptions.SSLError,
+                                               requests.exceptions.ChunkedEncodingError))
+        self.statuses = frozenset(Defaults.retry_statuses if statuses is None else statuses)
+
+    def backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        if self.jitter:
+            return random.uniform(0, delay)
+        return delay
+
+    def begin(self):
+        return RetryState(self)
+
+
+class RetryState(object):
+    """The attempts made so far for one request."""
+    def __init__(self, policy):
+        self.policy = policy
+        self.attempts = 1
+        self.started = time.time()
+        if policy.budget:
+            policy.budget.deposit()
+
+    def next_delay(self, backoff=True, counted=True):
+        """Claim another attempt and return the seconds to wait before it, or None if no attempt is allowed.
+
+        The caller sleeps, after letting go of what the failed attempt held.  An uncounted retry, such as one through
+        a fresh proxy after the last one was dropped, does not use up max_attempts; the deadline and the budget
+        still apply.
+        """
+        policy = self.policy
+        if counted and policy.max_attempts and self.attempts >= policy.max_attempts:
+            return None
+        delay = policy.backoff(self.attempts) if backoff else 0
+        if policy.deadline is not None and time.time() + delay - self.started >= policy.deadline:
+            return None
+        if policy.budget and not policy.budget.withdraw():
+            return None
+        if counted:
+            self.attempts += 1
+        return delay
+
+    def retry(self, backoff=True, counted=True):
+        """Wait out the backoff and return True if another attempt is allowed, else return False at once."""
+        delay = self.next_delay(backoff, counted)
+        if delay is None:
+            return False
+        if delay:
+            time.sleep(delay)
+        return True
@@ -3,6 +3,7 @@ import os
 
 class Defaults(object):
     logging_level = INFO
+    log_sample_rate = 1.0
     request_headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/536.5 (KHTML, like Gecko) Chrome/'
                       '19.0.1084.56 Safari/536.5',
@@ -10,4 +11,63 @@ class Defaults(object):
     }
     download_path = os.getcwd()
     use_per_proxy_count = 1000
-    connection_timeout_length = 5
\ No newline at end of file
+    connection_timeout_length = 5
+    read_timeout_length = 30
+    max_workers = 10
+    async_concurrency = 1000
+    download_chunk_size = 64 * 1024
+    max_decoded_size = 100 * 1024 * 1024
+    proxy_db_batch_size = 100
+    proxy_db_flush_interval = 1.0
+    proxy_latency_alpha = 0.3
+    proxy_initial_latency = 1.0
+    proxy_max_failures = 3
+    proxy_quarantine_base = 60
+    proxy_quarantine_max = 7 * 24 * 60 * 60
+    proxy_failure_decay = 60 * 60
+    pool_size_interval = 60
+    pool_size_retention = 30 * 24 * 60 * 60
+    proxy_check_url = "http://httpbin.org/ip"
+    proxy_check_timeout = 2
+    proxy_check_workers = 50
+    proxy_low_water_mark = 50
+    proxy_refresh_interval = 30 * 60
+    proxy_refresh_check = 5
+    proxy_refresh_min_interval = 60
+    proxy_cache_path = os.path.join(os.getcwd(), "proxy_cache")
+    proxy_cache_ttl = 15 * 60
+    retry_max_attempts = 10
+    retry_backoff_base = 0.25
+    retry_backoff_max = 5
+    retry_deadline = None
+    retry_budget_ratio = 0.2
+    retry_budget_min_per_second = 10
+    retry_statuses = (429, 502, 503, 504)
+    host_rate = None
+    proxy_rate = None
+    max_concurrency = None
+    throttle_statuses = (429, 503)
+    throttle_rate = 5.0
+    throttle_min_rate = 0.1
+    throttle_decrease = 0.5
+    throttle_increase = 0.1
+    frontier_capacity = 10 * 1000 * 1000
+    frontier_error_rate = 0.001
+    frontier_checkpoint_every = 1000
+    frontier_save_interval = 300
+    response_cache_size = 512 * 1024 * 1024
+    response_cache_touch_interval = 60
+    memo_max_entries = 1000
+    memo_ttl = 60
+    adapter_pool_connections = 10
+    adapter_pool_maxsize = 10
+    adapter_pool_block = False
+    adapter_max_proxy_managers = 100
+    timeout_percentile = 0.99
+    timeout_factor = 3
+    timeout_min_samples = 20
+    timeout_window = 200
+    connect_timeout_min = 0.5
+    read_timeout_min = 1
+    read_timeout_max = 120
+    metrics_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
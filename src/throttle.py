@@ -0,0 +1,127 @@
+import calendar
+import email.utils
+import threading
+import time
+
+from settings import Defaults
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(parsed) - calendar.timegm(time.gmtime()))
+
+
+class TokenBucket(object):
+    """Allows rate requests per second with bursts of up to burst; a rate of None means unlimited.
+
+    penalize() halves the rate (an unlimited bucket starts from Defaults.throttle_rate) and can hold every request
+    back until a Retry-After time.  reward() raises the rate additively again until it is back to the configured
+    rate, or to unlimited for a bucket that started unlimited.
+    """
+    def __init__(self, rate=None, burst=None):
+        self.configured_rate = rate
+        self.rate = rate
+        self.burst = burst or max(1, rate or 1)
+        self.__tokens = self.burst
+        self.__updated = time.time()
+        self.__blocked_until = 0
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent.  Returns the seconds waited."""
+        waited = 0.0
+        while 1:
+            with self.__lock:
+                now = time.time()
+                delay = self.__blocked_until - now
+                if delay <= 0 and self.rate is not None:
+                    self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+                    self.__updated = now
+                    if self.__tokens >= 1:
+                        self.__tokens -= 1
+                        return waited
+                    delay = (1 - self.__tokens) / self.rate
+                elif delay <= 0:
+                    return waited
+            time.sleep(delay)
+            waited += delay
+
+    def penalize(self, retry_after=None):
+        with self.__lock:
+            if self.rate is None:
+                self.rate = Defaults.throttle_rate
+                self.__tokens = min(self.__tokens, 1)
+                self.__updated = time.time()
+            self.rate = max(Defaults.throttle_min_rate, self.rate * Defaults.throttle_decrease)
+            if retry_after:
+                self.__blocked_until = max(self.__blocked_until, time.time() + retry_after)
+
+    def reward(self):
+        with self.__lock:
+            if self.rate is None or self.rate == self.configured_rate:
+                return
+            self.rate += Defaults.throttle_increase
+            ceiling = self.configured_rate or Defaults.throttle_rate
+            if self.rate >= ceiling:
+                self.rate = self.configured_rate
+
+
+class RateLimiter(object):
+    """Politeness scheduler applied around every request Get and Post send.
+
+    host_rate and proxy_rate are requests per second allowed to each host and through each proxy (None for no
+    limit) and max_concurrency caps the requests in flight across the whole Connect.  Responses with a status in
+    Defaults.throttle_statuses slow the host down and honour Retry-After; later successes speed it up again.
+    """
+    def __init__(self, host_rate=None, proxy_rate=None, max_concurrency=None, host_burst=None, proxy_burst=None):
+        self.host_rate = Defaults.host_rate if host_rate is None else host_rate
+        self.proxy_rate = Defaults.proxy_rate if proxy_rate is None else proxy_rate
+        self.host_burst = host_burst
+        self.proxy_burst = proxy_burst
+        self.max_concurrency = Defaults.max_concurrency if max_concurrency is None else max_concurrency
+        self.__slots = threading.BoundedSemaphore(self.max_concurrency) if self.max_concurrency else None
+        self.__hosts = {}
+        self.__proxies = {}
+        self.__lock = threading.Lock()
+
+    def host_bucket(self, host):
+        with self.__lock:
+            if host not in self.__hosts:
+                self.__hosts[host] = TokenBucket(self.host_rate, self.host_burst)
+            return self.__hosts[host]
+
+    def proxy_bucket(self, proxy):
+        with self.__lock:
+            if proxy not in self.__proxies:
+                self.__proxies[proxy] = TokenBucket(self.proxy_rate, self.proxy_burst)
+            return self.__proxies[proxy]
+
+    def acquire(self, host, proxy=None):
+        """Wait for the host's and the proxy's turn, then for a concurrency slot.
+
+        The slot is taken last so a host held back by Retry-After or a lowered rate never keeps other hosts waiting.
+        """
+        self.host_bucket(host).acquire()
+        if proxy and self.proxy_rate:
+            self.proxy_bucket(proxy).acquire()
+        if self.__slots is not None:
+            self.__slots.acquire()
+
+    def release(self):
+        if self.__slots is not None:
+            self.__slots.release()
+
+    def observe(self, host, response):
+        bucket = self.host_bucket(host)
+        if response.status_code in Defaults.throttle_statuses:
+            bucket.penalize(parse_retry_after(response.headers.get('Retry-After')))
+        elif response.status_code < 400:
+            bucket.reward()
@@ -0,0 +1,81 @@
+import bisect
+import collections
+import threading
+
+from settings import Defaults
+
+
+def log_bounds(low, high, ratio):
+    bounds = [low]
+    while bounds[-1] < high:
+        bounds.append(bounds[-1] * ratio)
+    return bounds
+
+
+class LatencyHistogram(object):
+    """Latencies of the last window observations counted in log-spaced buckets from 10ms to 10 minutes."""
+    bounds = log_bounds(0.01, 600, 1.25)
+
+    def __init__(self, window=None):
+        self.window = window or Defaults.timeout_window
+        self.counts = [0] * len(self.bounds)
+        self.__recent = collections.deque()
+
+    def __len__(self):
+        return len(self.__recent)
+
+    def add(self, latency):
+        index = min(bisect.bisect_left(self.bounds, latency), len(self.bounds) - 1)
+        self.counts[index] += 1
+        self.__recent.append(index)
+        if len(self.__recent) > self.window:
+            self.counts[self.__recent.popleft()] -= 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction (0.99 for p99) of the observations."""
+        wanted = max(1, fraction * len(self.__recent))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted:
+                return self.bounds[index]
+        return None
+
+
+class AdaptiveTimeouts(object):
+    """Per-host (connect, read) timeouts derived from the latencies observed for each host.
+
+    Until a host has min_samples observations the static Defaults.connection_timeout_length and
+    Defaults.read_timeout_length apply.  After that both timeouts are the host's percentile latency times factor,
+    clamped to [connect_min, connect_max] and [read_min, read_max], so fast hosts fail fast on a dead route while
+    slow ones keep the time they need.  Timed out reads count as observations of the timeout used, which lets the
+    read timeout grow again for a host that slows down.
+    """
+    def __init__(self, percentile=None, factor=None, min_samples=None, connect_min=None, connect_max=None,
+                 read_min=None, read_max=None, window=None):
+        self.percentile = percentile or Defaults.timeout_percentile
+        self.factor = factor or Defaults.timeout_factor
+        self.min_samples = min_samples or Defaults.timeout_min_samples
+        self.connect_min = connect_min or Defaults.connect_timeout_min
+        self.connect_max = connect_max or Defaults.connection_timeout_length
+        self.read_min = read_min or Defaults.read_timeout_min
+        self.read_max = read_max or Defaults.read_timeout_max
+        self.window = window
+        self.__hosts = {}
+        self.__lock = threading.Lock()
+
+    def timeout(self, host):
+        """The (connect, read) timeouts for a request to host."""
+        with self.__lock:
+            histogram = self.__hosts.get(host)
+            if histogram is None or len(histogram) < self.min_samples:
+                return Defaults.connection_timeout_length, Defaults.read_timeout_length
+            latency = histogram.percentile(self.percentile) * self.factor
+        return (min(self.connect_max, max(self.connect_min, latency)),
+                min(self.read_max, max(self.read_min, latency)))
+
+    def observe(self, host, latency):
+        with self.__lock:
+            if host not in self.__hosts:
+                self.__hosts[host] = LatencyHistogram(self.window)
+            self.__hosts[host].add(latency)
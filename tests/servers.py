@@ -0,0 +1,128 @@
+"""Local origin server and forwarding proxies for the tests, each on a free port of 127.0.0.1.
+
+The threaded servers serialize requests once gevent has patched the process, so patched tests serve
+origin_app through start_cooperative instead.
+"""
+import BaseHTTPServer
+import SocketServer
+import httplib
+import socket
+import threading
+import time
+import urlparse
+
+
+class OriginHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """GET /text/<anything> echoes the path, /slow/<seconds> answers after a delay."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = urlparse.urlsplit(self.path).path
+        if path.startswith('/slow/'):
+            time.sleep(float(path.rsplit('/', 1)[1]))
+        body = "path %s" % path
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def origin_app(environ, start_response):
+    """The WSGI twin of OriginHandler."""
+    path = environ['PATH_INFO']
+    if path.startswith('/slow/'):
+        time.sleep(float(path.split('/')[2]))
+    body = "path %s" % path
+    start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))])
+    return [body]
+
+
+class ProxyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Forwards plain HTTP requests after the server's delay, or answers with the server's status if it is set."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        if self.server.status:
+            status, body = self.server.status, "proxy error"
+        else:
+            url = urlparse.urlsplit(self.path)
+            origin = httplib.HTTPConnection(url.netloc)
+            origin.request('GET', url.path + ('?' + url.query if url.query else ''))
+            response = origin.getresponse()
+            status, body = response.status, response.read()
+            origin.close()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = False  # let handlers still answering finish before the interpreter exits
+    request_queue_size = 1024
+    delay = 0
+    status = None
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self.server_address
+
+    def handle_error(self, request, client_address):
+        pass  # clients that time out hang up mid-response
+
+
+try:
+    from gevent import pywsgi
+except ImportError:
+    pywsgi = None
+else:
+    class CooperativeServer(pywsgi.WSGIServer):
+        @property
+        def url(self):
+            return "http://%s:%d" % self.address[:2]
+
+        def shutdown(self):
+            self.stop()
+
+        def server_close(self):
+            pass
+
+
+def start(handler_class, **attributes):
+    server = LocalServer(('127.0.0.1', 0), handler_class)
+    for name, value in attributes.iteritems():
+        setattr(server, name, value)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def start_cooperative(application=origin_app):
+    """Serve a WSGI application from gevent's loop; the returned server has the same url and stop() as LocalServer."""
+    server = CooperativeServer(('127.0.0.1', 0), application, log=None)
+    server.start()
+    return server
+
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+
+
+def dead_url():
+    """The URL of a local port nothing listens on."""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+    listener.close()
+    return "http://127.0.0.1:%d" % port
@@ -0,0 +1,98 @@
+"""AsyncConnect against a local server.
+
+The engine needs gevent's cooperative sockets, and monkey-patching cannot be undone, so the patched tests run in a
+child process started by AsyncConnectTest.test_patched_engine with SWS_GEVENT_TESTS set.
+"""
+import os
+
+if os.environ.get('SWS_GEVENT_TESTS'):
+    from gevent import monkey
+    monkey.patch_all()
+
+import logging
+import subprocess
+import sys
+import time
+import unittest
+
+import servers
+from simplewebscraper import Request
+from simplewebscraper.async_connection import AsyncConnect
+from simplewebscraper.retry import RetryPolicy
+
+try:
+    import gevent
+    import gevent.monkey
+except ImportError:
+    gevent = None
+
+logger = logging.getLogger("tests")
+logger.addHandler(logging.NullHandler())
+
+
+@unittest.skipIf(gevent is None, "gevent is not installed")
+class AsyncConnectTest(unittest.TestCase):
+    def test_requires_patched_sockets(self):
+        if gevent.monkey.is_module_patched('socket'):
+            self.skipTest("sockets are already patched")
+        with self.assertRaises(Exception) as raised:
+            AsyncConnect(logger)
+        self.assertIn("patch_all", str(raised.exception))
+
+    def test_patched_engine(self):
+        if os.environ.get('SWS_GEVENT_TESTS'):
+            self.skipTest("already in the patched process")
+        environment = dict(os.environ, SWS_GEVENT_TESTS='1')
+        child = subprocess.Popen([sys.executable, '-m', 'unittest', 'test_async_connection.PatchedAsyncConnectTest'],
+                                 cwd=os.path.dirname(os.path.abspath(__file__)), env=environment,
+                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = child.communicate()[0]
+        self.assertEqual(child.returncode, 0, output)
+
+
+@unittest.skipUnless(os.environ.get('SWS_GEVENT_TESTS'), "runs in the patched child process")
+class PatchedAsyncConnectTest(unittest.TestCase):
+    def setUp(self):
+        self.origin = servers.start_cooperative()
+        self.scraper = AsyncConnect(logger, concurrency=100)
+        self.scraper.retry_policy = RetryPolicy(max_attempts=2, backoff_base=0.01, budget=False)
+
+    def tearDown(self):
+        servers.stop(self.origin)
+
+    def requests(self, count, path='/text'):
+        return [Request("%s%s/%d" % (self.origin.url, path, index)) for index in xrange(count)]
+
+    def test_fetch_many_ordered(self):
+        results = self.scraper.fetch_many(self.requests(50))
+        self.assertEqual([result.content for result in results], ["path /text/%d" % index for index in xrange(50)])
+        self.assertTrue(all(result.ok for result in results))
+
+    def test_fetch_many_unordered(self):
+        results = list(self.scraper.fetch_many(self.requests(50), ordered=False))
+        self.assertEqual(sorted(result.content for result in results),
+                         sorted("path /text/%d" % index for index in xrange(50)))
+
+    def test_requests_wait_concurrently(self):
+        started = time.time()
+        results = self.scraper.fetch_many(self.requests(100, '/slow/0.3'))
+        self.assertTrue(all(result.ok for result in results))
+        self.assertLess(time.time() - started, 3)  # 30 seconds one after another
+
+    def test_failure_stays_on_its_result(self):
+        results = self.scraper.fetch_many([Request(self.origin.url + '/text/ok'), Request(servers.dead_url())])
+        self.assertTrue(results[0].ok)
+        self.assertFalse(results[1].ok)
+
+    def test_spawn_and_join(self):
+        greenlets = [self.scraper.spawn(request) for request in self.requests(20, '/slow/0.2')]
+        started = time.time()
+        self.scraper.join(timeout=10)
+        self.assertLess(time.time() - started, 3)
+        self.assertTrue(all(greenlet.ready() for greenlet in greenlets))
+        self.assertEqual([greenlet.value for greenlet in greenlets],
+                         ["path /slow/0.2/%d" % index for index in xrange(20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
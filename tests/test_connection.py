@@ -0,0 +1,88 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+
+import servers
+from simplewebscraper import Connect, RateLimiter, RetryPolicy
+from simplewebscraper.db_manager import ProxyDB
+from simplewebscraper.enumerations import HTTPMethods
+
+logger = logging.getLogger("tests")
+logger.addHandler(logging.NullHandler())
+
+
+class ProxyFailoverTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = ProxyDB.location
+        ProxyDB.location = os.path.join(self.directory, "badproxies.sqlite")
+        self.origin = servers.start(servers.OriginHandler)
+        self.proxy = servers.start(servers.ProxyHandler)
+        self.connect = Connect(logger)
+        self.connect.HTTP_mode = HTTPMethods.GET
+        self.connect.url = self.origin.url + '/text/page'
+
+    def tearDown(self):
+        servers.stop(self.proxy)
+        servers.stop(self.origin)
+        ProxyDB.shared().close()
+        ProxyDB.location = self.location
+        shutil.rmtree(self.directory)
+
+    def test_refused_proxies_are_dropped_at_once(self):
+        dead = [servers.dead_url() for _ in xrange(4)]
+        self.connect.retry_policy = RetryPolicy(max_attempts=2)
+        self.connect.proxy_pool = {'http': dead + [self.proxy.url]}
+        started = time.time()
+        self.assertEqual(self.connect.fetch(), "path /text/page")
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual(list(self.connect.proxy_pool['http']), [self.proxy.url])
+        self.connect.proxy_db.flush()
+        self.assertEqual(self.connect.proxy_db.prune_bad_proxies({'http': dead})['http'], [])
+
+    def test_failing_proxy_moves_to_the_back(self):
+        self.connect.retry_policy = RetryPolicy(backoff_base=0.01)
+        broken = servers.start(servers.ProxyHandler, status=502)
+        try:
+            self.connect.proxy_pool = {'http': [broken.url, self.proxy.url]}
+            self.assertEqual(self.connect.fetch(), "path /text/page")
+            self.assertEqual(list(self.connect.proxy_pool['http']), [self.proxy.url, broken.url])
+        finally:
+            servers.stop(broken)
+
+    def test_backoff_releases_the_slot_and_the_proxy(self):
+        self.connect.retry_policy = RetryPolicy(max_attempts=2, backoff_base=1, jitter=False, budget=False)
+        self.connect.rate_limiter = RateLimiter(max_concurrency=1)
+        unavailable = servers.start(servers.ProxyHandler, status=503)
+        errors = []
+
+        def fetch():
+            try:
+                self.connect.fetch()
+            except requests.exceptions.HTTPError as exc:
+                errors.append(exc)
+
+        try:
+            self.connect.proxy_pool = {'http': [unavailable.url]}
+            fetching = threading.Thread(target=fetch)
+            fetching.start()
+            time.sleep(0.5)
+            self.assertEqual(self.connect.proxy_pool['http'].get(unavailable.url).in_flight, 0)
+            started = time.time()
+            self.connect.rate_limiter.acquire('other.example')
+            self.assertLess(time.time() - started, 0.2)
+            self.connect.rate_limiter.release()
+            fetching.join()
+            self.assertEqual(errors[0].response.status_code, 503)
+        finally:
+            servers.stop(unavailable)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import random
+import unittest
+
+from simplewebscraper.convert_response import iter_json_items
+
+
+def random_chunks(text, generator, max_size):
+    chunks = []
+    position = 0
+    while position < len(text):
+        size = generator.randint(1, max_size)
+        chunks.append(text[position:position + size])
+        position += size
+    return chunks
+
+
+def random_item(generator, depth=0):
+    kinds = ['int', 'float', 'exponent', 'string', 'literal'] + (['list', 'object'] if depth < 2 else [])
+    kind = generator.choice(kinds)
+    if kind == 'int':
+        return generator.randint(-10 ** 6, 10 ** 6)
+    if kind == 'float':
+        return round(generator.uniform(-1000, 1000), generator.randint(1, 6))
+    if kind == 'exponent':
+        return generator.uniform(1, 9) * 10 ** generator.randint(-20, 20)
+    if kind == 'string':
+        return u"".join(generator.choice(u'ab "\\/\n\u00e9]},[{') for _ in xrange(generator.randint(0, 12)))
+    if kind == 'literal':
+        return generator.choice([True, False, None])
+    if kind == 'list':
+        return [random_item(generator, depth + 1) for _ in xrange(generator.randint(0, 4))]
+    return dict(("k%d" % index, random_item(generator, depth + 1)) for index in xrange(generator.randint(0, 4)))
+
+
+class IterJSONItemsTest(unittest.TestCase):
+    def test_number_split_at_chunk_boundary(self):
+        self.assertEqual(list(iter_json_items(['[1.', '5, 2]'])), [1.5, 2])
+        self.assertEqual(list(iter_json_items(['[12e', '3]'])), [12e3])
+        self.assertEqual(list(iter_json_items(['[-', '7', '.25', ']'])), [-7.25])
+        self.assertEqual(list(iter_json_items(['[tr', 'ue, nu', 'll]'])), [True, None])
+
+    def test_random_chunk_splits(self):
+        generator = random.Random(20)
+        for _ in xrange(200):
+            items = [random_item(generator) for _ in xrange(generator.randint(0, 30))]
+            text = json.dumps({'meta': {'count': len(items)}, 'data': {'results': items}},
+                              separators=generator.choice([(',', ':'), (', ', ': ')]))
+            expected = json.loads(text)['data']['results']
+            chunks = random_chunks(text, generator, generator.choice([1, 3, 16, 64]))
+            self.assertEqual(list(iter_json_items(chunks, "data.results")), expected)
+
+    def test_array_of_floats_in_large_chunks(self):
+        generator = random.Random(7)
+        items = [round(generator.uniform(0, 10 ** 4), 2) for _ in xrange(50000)]
+        text = json.dumps(items)
+        chunks = [text[position:position + 65536] for position in xrange(0, len(text), 65536)]
+        self.assertEqual(list(iter_json_items(chunks)), items)
+
+    def test_path(self):
+        text = '{"pages": [{"items": [1, 2]}, {"items": [{"a": "]"}, 4]}]}'
+        self.assertEqual(list(iter_json_items([text], "pages.1.items")), [{"a": "]"}, 4])
+        self.assertEqual(list(iter_json_items([text], "pages.5.items")), [])
+        self.assertEqual(list(iter_json_items([text], "missing")), [])
+
+    def test_non_array_value_is_the_only_item(self):
+        self.assertEqual(list(iter_json_items(['{"a": ', '{"b": 1}}'], "a")), [{"b": 1}])
+        self.assertEqual(list(iter_json_items(['[]'])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
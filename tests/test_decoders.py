@@ -0,0 +1,59 @@
+import gzip
+import io
+import random
+import unittest
+import zlib
+
+import requests
+from requests.packages.urllib3 import HTTPResponse
+from requests.structures import CaseInsensitiveDict
+
+from simplewebscraper.decoders import DecompressionBombError, iter_decoded, read_decoded
+
+
+def gz(data):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as compressed:
+        compressed.write(data)
+    return buffer.getvalue()
+
+
+def streamed(body, encoding=None):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers = CaseInsensitiveDict({'Content-Encoding': encoding} if encoding else {})
+    response.raw = HTTPResponse(body=io.BytesIO(body), preload_content=False, decode_content=False)
+    return response
+
+
+class ReadDecodedTest(unittest.TestCase):
+    def test_gzip_members(self):
+        self.assertEqual(read_decoded(streamed(gz('first ') + gz('second'), 'gzip')), 'first second')
+
+    def test_gzip_members_in_small_chunks(self):
+        generator = random.Random(3)
+        parts = ["".join(chr(generator.randint(0, 255)) for _ in xrange(generator.randint(0, 5000)))
+                 for _ in xrange(5)]
+        response = streamed(''.join(gz(part) for part in parts), 'gzip')
+        self.assertEqual(''.join(iter_decoded(response, chunk_size=7)), ''.join(parts))
+
+    def test_gzip_zero_padding(self):
+        self.assertEqual(read_decoded(streamed(gz('body') + '\0' * 16, 'gzip')), 'body')
+
+    def test_deflate(self):
+        self.assertEqual(read_decoded(streamed(zlib.compress('wrapped'), 'deflate')), 'wrapped')
+        raw = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.assertEqual(read_decoded(streamed(raw.compress('raw') + raw.flush(), 'deflate')), 'raw')
+
+    def test_size_limit_applies_to_compressed_bodies_only(self):
+        with self.assertRaises(DecompressionBombError):
+            read_decoded(streamed(gz('a' * 5000) + gz('b' * 5000), 'gzip'), max_size=8000)
+        self.assertEqual(len(read_decoded(streamed('a' * 10000), max_size=8000)), 10000)
+
+    def test_corrupt_body(self):
+        with self.assertRaises(requests.exceptions.ContentDecodingError):
+            read_decoded(streamed(gz('first') + 'not gzip', 'gzip'))
+
+
+if __name__ == '__main__':
+    unittest.main()
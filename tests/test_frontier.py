@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from simplewebscraper.frontier import BloomFilter, Frontier, canonicalize_url
+
+
+class CanonicalizeURLTest(unittest.TestCase):
+    def test_equivalent_spellings(self):
+        self.assertEqual(canonicalize_url("HTTP://Example.COM:80/a/./b/../c?y=2&x=1#top"),
+                         "http://example.com/a/c?x=1&y=2")
+        self.assertEqual(canonicalize_url("https://example.com:443"), "https://example.com/")
+        self.assertEqual(canonicalize_url("http://example.com/%7euser/%e9"), "http://example.com/~user/%E9")
+        self.assertEqual(canonicalize_url(u"http://example.com/café"), "http://example.com/caf%C3%A9")
+
+    def test_reserved_escapes_are_kept(self):
+        self.assertEqual(canonicalize_url("http://example.com/a%2Fb"), "http://example.com/a%2Fb")
+        self.assertNotEqual(canonicalize_url("http://example.com/a%2Fb"), canonicalize_url("http://example.com/a/b"))
+        self.assertEqual(canonicalize_url("http://example.com/100%"), "http://example.com/100%25")
+
+    def test_query_keeps_its_shape(self):
+        self.assertEqual(canonicalize_url("http://example.com/?a=1&a=0"), "http://example.com/?a=1&a=0")
+        self.assertEqual(canonicalize_url("http://example.com/?b=2&a=1&a=0"), "http://example.com/?a=1&a=0&b=2")
+        self.assertEqual(canonicalize_url("http://example.com/?q"), "http://example.com/?q")
+        self.assertEqual(canonicalize_url("http://example.com/?a=1;b=2"), "http://example.com/?a=1;b=2")
+        self.assertEqual(canonicalize_url("http://example.com/?q=a+b%2Bc"), "http://example.com/?q=a+b%2Bc")
+
+
+class BloomFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "seen.bloom")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=10000, error_rate=0.01)
+        keys = ["http://example.com/%d" % index for index in xrange(10000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(1 for index in xrange(10000) if "http://example.org/%d" % index in bloom)
+        self.assertLess(false_positives, 300)
+
+    def test_saving_changed_pages_matches_a_full_write(self):
+        bloom = BloomFilter(capacity=100000, error_rate=0.01)
+        for index in xrange(1000):
+            bloom.add("first %d" % index)
+        bloom.save(self.path)
+        for index in xrange(50):
+            bloom.add("second %d" % index)
+        bloom.save(self.path)
+        loaded = BloomFilter.load(self.path)
+        self.assertEqual(loaded.bits, bloom.bits)
+        self.assertEqual(len(loaded), len(bloom))
+        self.assertIn("second 49", loaded)
+
+
+class FrontierTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, "crawl.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_dedup_and_priority(self):
+        frontier = Frontier(self.location, capacity=1000)
+        self.assertTrue(frontier.push("http://example.com/a?y=1&x=2"))
+        self.assertFalse(frontier.push("http://EXAMPLE.com/a?x=2&y=1#part"))
+        self.assertTrue(frontier.push("http://example.com/b", priority=5))
+        self.assertEqual(len(frontier), 2)
+        self.assertEqual(frontier.pop(2), ["http://example.com/b", "http://example.com/a?y=1&x=2"])
+        frontier.done("http://example.com/a?x=2&y=1")
+        self.assertFalse(frontier.push("http://example.com/a?y=1&x=2"))
+        frontier.close()
+
+    def test_pop_returns_the_url_as_pushed(self):
+        frontier = Frontier(self.location, capacity=1000)
+        frontier.push("http://example.com/search?q;page=2")
+        frontier.push(u"http://example.com/café?b=1&a")
+        self.assertEqual(frontier.pop(2), ["http://example.com/search?q;page=2", "http://example.com/caf%C3%A9?b=1&a"])
+        frontier.close()
+
+    def test_resume_after_crash(self):
+        frontier = Frontier(self.location, capacity=1000, checkpoint_every=1, save_interval=0)
+        for index in xrange(5):
+            frontier.push("http://example.com/%d" % index, priority=-index)
+        self.assertEqual(frontier.pop(2), ["http://example.com/0", "http://example.com/1"])
+        frontier.done("http://example.com/0")
+        frontier.disconnect()  # No close(): the process died with /1 being fetched
+
+        resumed = Frontier(self.location, capacity=1000)
+        self.assertEqual(len(resumed), 4)
+        self.assertEqual(resumed.pop(10), ["http://example.com/%d" % index for index in xrange(1, 5)])
+        self.assertFalse(resumed.push("http://example.com/0"))
+        self.assertFalse(resumed.push("http://example.com/3"))
+        self.assertTrue(resumed.push("http://example.com/5"))
+        resumed.close()
+
+    def test_uncommitted_pushes_are_lost_but_never_half_seen(self):
+        frontier = Frontier(self.location, capacity=1000, checkpoint_every=100, save_interval=0)
+        frontier.push("http://example.com/kept")
+        frontier.checkpoint()
+        frontier.push("http://example.com/lost")
+        frontier.disconnect()
+
+        resumed = Frontier(self.location, capacity=1000)
+        self.assertEqual(resumed.pop(10), ["http://example.com/kept"])
+        self.assertTrue(resumed.push("http://example.com/lost"))
+        resumed.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from simplewebscraper import Connect, ProxyValidator
+from simplewebscraper.db_manager import ProxyDB
+from simplewebscraper.pool_refresher import PoolRefresher
+from simplewebscraper.proxy_aggregators import Aggregator
+
+logger = logging.getLogger("tests")
+logger.addHandler(logging.NullHandler())
+
+
+class HTTPOnly(Aggregator):
+    cache_ttl = 0
+
+    def __init__(self, count):
+        self.count = count
+        self.runs = 0
+
+    def fetch(self):
+        self.runs += 1
+        return ["10.0.%d.%d:8080" % (index // 250, index % 250) for index in xrange(self.count)]
+
+
+class CountingValidator(ProxyValidator):
+    def __init__(self):
+        ProxyValidator.__init__(self)
+        self.probed = []
+
+    def validate(self, socket_dict):
+        self.probed.extend(proxy for proxies in socket_dict.itervalues() for proxy in proxies)
+        return dict((protocol, [(proxy, 0.1) for proxy in proxies]) for protocol, proxies in socket_dict.iteritems()), []
+
+
+class PoolRefresherTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = ProxyDB.location
+        ProxyDB.location = os.path.join(self.directory, "badproxies.sqlite")
+        self.connect = Connect(logger)
+
+    def tearDown(self):
+        ProxyDB.shared().close()
+        ProxyDB.location = self.location
+        shutil.rmtree(self.directory)
+
+    def test_only_supplied_protocols_are_checked(self):
+        refresher = PoolRefresher(self.connect, HTTPOnly(200), low_water_mark=50, min_interval=0)
+        refresher.refresh()
+        self.assertEqual(len(self.connect.proxy_pool['http']), 200)
+        self.assertEqual(len(self.connect.proxy_pool.get('https', ())), 0)
+        self.assertFalse(refresher.needs_refresh())
+        for proxy in list(self.connect.proxy_pool['http'])[:160]:
+            self.connect.expire_proxy('http', proxy)
+        self.assertTrue(refresher.needs_refresh())
+
+    def test_live_proxies_are_not_validated_again(self):
+        validator = self.connect.proxy_validator = CountingValidator()
+        aggregator = HTTPOnly(100)
+        refresher = PoolRefresher(self.connect, aggregator, low_water_mark=50, min_interval=0)
+        refresher.refresh()
+        self.assertEqual(len(validator.probed), 100)
+        aggregator.count = 120
+        self.assertEqual(refresher.refresh(), 20)
+        self.assertEqual(len(validator.probed), 120)
+        self.assertEqual(len(self.connect.proxy_pool['http']), 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
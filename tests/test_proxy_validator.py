@@ -0,0 +1,64 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import servers
+from simplewebscraper import Connect, ProxyValidator
+from simplewebscraper.db_manager import ProxyDB
+
+logger = logging.getLogger("tests")
+logger.addHandler(logging.NullHandler())
+
+
+class ProxyValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = ProxyDB.location
+        ProxyDB.location = os.path.join(self.directory, "badproxies.sqlite")
+        self.origin = servers.start(servers.OriginHandler)
+        self.servers = [servers.start(servers.ProxyHandler, delay=0.3), servers.start(servers.ProxyHandler),
+                        servers.start(servers.ProxyHandler, status=502)]
+        self.slow, self.fast, self.broken = [server.url for server in self.servers]
+        self.dead = servers.dead_url()
+        self.validator = ProxyValidator(check_url=self.origin.url + '/text/check', timeout=2)
+
+    def tearDown(self):
+        for server in self.servers + [self.origin]:
+            servers.stop(server)
+        ProxyDB.shared().close()
+        ProxyDB.location = self.location
+        shutil.rmtree(self.directory)
+
+    def test_validate(self):
+        responsive, failed = self.validator.validate({'http': [self.slow, self.dead, self.fast, self.broken]})
+        self.assertEqual([proxy for proxy, latency in responsive['http']], [self.fast, self.slow])
+        self.assertLess(responsive['http'][0][1], responsive['http'][1][1])
+        self.assertEqual(sorted(failed), sorted([('http', self.dead), ('http', self.broken)]))
+
+    def test_timeout_fails_the_proxy(self):
+        responsive, failed = ProxyValidator(check_url=self.origin.url + '/text/check', timeout=0.1).validate(
+            {'http': [self.slow, self.fast]})
+        self.assertEqual([proxy for proxy, latency in responsive['http']], [self.fast])
+        self.assertEqual(failed, [('http', self.slow)])
+
+    def test_empty_pool(self):
+        self.assertEqual(self.validator.validate({'http': []}), ({'http': []}, []))
+
+    def test_connect_builds_pool_fastest_first_and_quarantines_failures(self):
+        connect = Connect(logger)
+        connect.proxy_validator = self.validator
+        connect.proxy_pool = {'http': [self.slow, self.dead, self.fast, self.broken]}
+        self.assertEqual(list(connect.proxy_pool['http']), [self.fast, self.slow])
+        connect.proxy_db.flush()
+        candidates = {'http': [self.slow, self.dead, self.fast, self.broken]}
+        self.assertEqual(connect.proxy_db.prune_bad_proxies(candidates)['http'], [self.slow, self.fast])
+
+    def test_validator_type(self):
+        with self.assertRaises(TypeError):
+            Connect(logger).proxy_validator = object()
+
+
+if __name__ == '__main__':
+    unittest.main()
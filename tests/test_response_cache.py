@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from simplewebscraper import ResponseCache
+
+
+def response(body, etag):
+    stored = requests.Response()
+    stored.status_code = 200
+    stored.headers = CaseInsensitiveDict({'ETag': etag, 'Content-Type': 'text/plain'})
+    stored._content = body
+    return stored
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, "responses.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        cache = ResponseCache(self.location)
+        cache.put('key', 'http://example.com/', response('body', '"v1"'))
+        headers, body, etag, last_modified = cache.get('key')
+        self.assertEqual((body, etag, last_modified), ('body', '"v1"', None))
+        self.assertEqual(cache.conditional_headers(cache.get('key')), {'If-None-Match': '"v1"'})
+        self.assertEqual(cache.as_response(cache.get('key'), 'http://example.com/').content, 'body')
+        self.assertIsNone(cache.get('missing'))
+        cache.close()
+
+    def test_hits_do_not_write(self):
+        cache = ResponseCache(self.location)
+        cache.put('key', 'http://example.com/', response('body', '"v1"'))
+        changes = cache.conn.total_changes
+        for _ in xrange(100):
+            cache.get('key')
+        self.assertEqual(cache.conn.total_changes, changes)
+        cache.close()
+
+    def test_hits_still_count_for_eviction(self):
+        cache = ResponseCache(self.location, max_size=25, touch_interval=0.05)
+        cache.put('old', 'http://example.com/old', response('o' * 10, '"o"'))
+        cache.put('new', 'http://example.com/new', response('n' * 10, '"n"'))
+        time.sleep(0.1)
+        self.assertIsNotNone(cache.get('old'))
+        cache.put('third', 'http://example.com/third', response('t' * 10, '"t"'))
+        self.assertIsNotNone(cache.get('old'))
+        self.assertIsNone(cache.get('new'))
+        cache.close()
+
+    def test_touches_are_written_on_close(self):
+        cache = ResponseCache(self.location, touch_interval=0.05)
+        cache.put('key', 'http://example.com/', response('body', '"v1"'))
+        time.sleep(0.1)
+        hit = time.time()
+        cache.get('key')
+        cache.close()
+        reopened = ResponseCache(self.location)
+        accessed = reopened.execute('SELECT ACCESSED FROM RESPONSES WHERE KEY = ?', ('key',)).fetchone()[0]
+        self.assertGreaterEqual(accessed, hit)
+        reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
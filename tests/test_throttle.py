@@ -0,0 +1,37 @@
+import threading
+import time
+import unittest
+
+from simplewebscraper.throttle import RateLimiter
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_blocked_host_does_not_hold_a_slot(self):
+        limiter = RateLimiter(max_concurrency=1)
+        limiter.host_bucket('slow.example').penalize(retry_after=2)
+        blocked = threading.Thread(target=limiter.acquire, args=('slow.example',))
+        blocked.daemon = True
+        blocked.start()
+        time.sleep(0.1)
+        started = time.time()
+        limiter.acquire('fast.example')
+        self.assertLess(time.time() - started, 1)
+        limiter.release()
+        blocked.join()
+        limiter.release()
+
+    def test_max_concurrency(self):
+        limiter = RateLimiter(max_concurrency=1)
+        limiter.acquire('example.com')
+        acquired = threading.Event()
+        waiting = threading.Thread(target=lambda: (limiter.acquire('example.com'), acquired.set()))
+        waiting.daemon = True
+        waiting.start()
+        self.assertFalse(acquired.wait(0.2))
+        limiter.release()
+        self.assertTrue(acquired.wait(1))
+        limiter.release()
+
+
+if __name__ == '__main__':
+    unittest.main()